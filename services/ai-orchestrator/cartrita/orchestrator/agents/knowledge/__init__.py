@@ -5,7 +5,8 @@ enabling intelligent knowledge retrieval and information
 processing capabilities.
 """
 
+from .faiss_backend import FaissBackend
 from .knowledge_agent import KnowledgeAgent
 
 __version__ = "2.0.0"
-__all__ = ["KnowledgeAgent"]
+__all__ = ["FaissBackend", "KnowledgeAgent"]
@@ -6,18 +6,138 @@ Knowledge Agent for Cartrita AI OS.
 Specialized agent for document search, knowledge retrieval, and RAG using GPT-5.
 """
 
+import asyncio
+import hashlib
+import os
 import time
+import weakref
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
 from typing import Any
+from zoneinfo import ZoneInfo
 
+import httpx
+import numpy as np
 import structlog
+import tiktoken
 from langchain_core.messages import HumanMessage, SystemMessage
 from cartrita.orchestrator.utils.llm_factory import create_chat_openai
-from pydantic import BaseModel, Field
+from cartrita.orchestrator.utils.semantic_cache import SemanticQueryCache
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 
 
 # Configure logger
 logger = structlog.get_logger(__name__)
 
+# Token budget shared by all source excerpts placed in a RAG prompt
+SOURCE_TOKEN_BUDGET = 6000
+# Generous chars-per-token bound used to pre-cut content before encoding
+_MAX_CHARS_PER_TOKEN = 8
+# Typical English chars-per-token, used when no tokenizer is available
+_AVG_CHARS_PER_TOKEN = 4
+
+# Timezone used for the time stamp placed in RAG prompts
+_MIAMI_TZ = ZoneInfo("America/New_York")
+
+
+@lru_cache(maxsize=1)
+def _format_context_minute(epoch_minute: int) -> str:
+    """Format a minute-granularity time stamp; calls within a minute share it."""
+    return datetime.fromtimestamp(epoch_minute * 60, _MIAMI_TZ).strftime('%A, %B %d, %Y at %I:%M %p %Z')
+
+
+# Shared knowledge LLMs per event loop: pooled httpx connections are bound to the loop
+# that opened them, so a client reused after its loop closes fails with "Event loop is
+# closed". Entries go away with their loop.
+_knowledge_llms_by_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple[str, str], Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+_knowledge_llms_outside_loop: dict[tuple[str, str], Any] = {}
+# Marks agents that use the shared per-loop LLM rather than an explicitly assigned one
+_SHARED_LLM = object()
+
+
+def _shared_knowledge_llm(model: str, api_key: str) -> Any:
+    """Return one knowledge LLM per (model, key) and event loop so agents share its connection pool."""
+    try:
+        llms = _knowledge_llms_by_loop.setdefault(asyncio.get_running_loop(), {})
+    except RuntimeError:
+        llms = _knowledge_llms_outside_loop
+    llm = llms.get((model, api_key))
+    if llm is None:
+        llm = llms[(model, api_key)] = create_chat_openai(
+            model=model,
+            temperature=1.0,
+            max_completion_tokens=4096,
+            openai_api_key=api_key,
+            http_async_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=200, max_keepalive_connections=100)
+            ),
+        )
+    return llm
+
+
+@lru_cache(maxsize=None)
+def _token_encoder(model: str) -> tiktoken.Encoding | None:
+    """Return the tiktoken encoding for ``model``; None if it cannot be loaded."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("tiktoken encoding unavailable, truncating by characters", model=model, error=str(e))
+        return None
+
+
+# Prompt-prefix caching contract: OpenAI reuses cached prefill for a
+# byte-identical prompt prefix (>= 1024 tokens). The system prompt and the
+# static instruction scaffold therefore come first and must never interpolate
+# per-request values; time, sources and the query go at the end.
+KNOWLEDGE_SYSTEM_PROMPT = (
+    "You are Cartrita's Knowledge Agent. Your job is to synthesize accurate, well-attributed, and"
+    " actionable answers strictly from the provided sources. Do not invent facts. If information"
+    " is missing or uncertain, say so and propose next steps. Keep explanations clear and concise."
+)
+
+# Seconds the primary RAG call runs alone before the fallback is raced against it
+RAG_HEDGE_DELAY = 3.0
+
+# Speculative generation: answer used only when search returns no sources, since its
+# prompt carries none; a single source still goes through the RAG path
+SPECULATIVE_SYSTEM_PROMPT = (
+    "You are Cartrita's Knowledge Agent. No documents were retrieved for this query. Answer briefly"
+    " from general knowledge, state clearly that the answer is not backed by the knowledge base,"
+    " and suggest how the user could verify it."
+)
+
+# Static user-prompt scaffold; per-request slots are joined between these
+_PROMPT_HEAD = (
+    "# Knowledge Synthesis Request\n"
+    "## Instructions\n"
+    "- Base the answer only on the sources.\n"
+    "- Identify conflicts and note currency/recency.\n"
+    "- Separate facts from analysis.\n"
+    "- Use the output structure exactly.\n\n"
+    "## Output Structure\n"
+    "### Direct Answer\n"
+    "Provide a 2-3 sentence direct answer.\n\n"
+    "### Details\n"
+    "Synthesize key points from multiple sources, highlighting agreements and disagreements.\n\n"
+    "### Sources\n"
+    "Cite using footnote numbers like [1], [2] that correspond to the footnotes below.\n\n"
+    "### Gaps or Uncertainty\n"
+    "State what is unknown or requires verification; suggest next steps or search refinements.\n\n"
+    "### Related Insights\n"
+    "Offer 1-3 concise related insights.\n\n"
+    "## Sources (do not assume anything not contained below)\n"
+    "<<<SOURCES>>>\n"
+)
+_PROMPT_MID = "\n<<<END_SOURCES>>>\n\n## Footnotes\n"
+_PROMPT_TAIL = "\n\n## Request\n"
+
 
 # ============================================
 # Knowledge Models
@@ -53,6 +173,26 @@ class KnowledgeDocument(BaseModel):
     )
 
 
+@dataclass(slots=True)
+class _RetrievedDocument:
+    """Lightweight search hit used inside the RAG pipeline.
+
+    Mirrors KnowledgeDocument without per-instance validation or ``__dict__``;
+    hits are validated into KnowledgeDocument in one batch at the response
+    boundary.
+    """
+
+    id: str
+    title: str
+    content: str
+    source: str
+    relevance_score: float = 0.0
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+
+_DOCUMENT_LIST_ADAPTER = TypeAdapter(list[KnowledgeDocument])
+
+
 class KnowledgeResponse(BaseModel):
     """Knowledge response model."""
 
@@ -98,18 +238,16 @@ class KnowledgeAgent:
         self.model = model or _settings.ai.knowledge_model
         self.api_key = api_key or _settings.ai.openai_api_key.get_secret_value()
         self.db_manager = db_manager
+        self._resolve_db_search_methods()
 
-        # Initialize GPT-5 knowledge model with fallback support
+        # Initialize GPT-5 knowledge model with fallback support; the shared client is
+        # resolved per event loop on access (see ``knowledge_llm``)
         try:
-            self.knowledge_llm = create_chat_openai(
-                model=self.model,
-                temperature=1.0,
-                max_completion_tokens=4096,
-                openai_api_key=self.api_key,
-            )
+            _shared_knowledge_llm(self.model, self.api_key)
+            self._knowledge_llm: Any = _SHARED_LLM
         except Exception as e:
             logger.warning("Failed to initialize OpenAI client, will use fallback", error=str(e))
-            self.knowledge_llm = None
+            self._knowledge_llm = None
 
         # Import fallback provider
         try:
@@ -120,11 +258,46 @@ class KnowledgeAgent:
             logger.error("Failed to initialize fallback provider", error=str(e))
             self.fallback_provider = None
 
+        # Semantic query cache (disabled if embeddings are unavailable); answers expire so
+        # documents added or changed in the DB reach near-duplicate queries
+        self.embedding_model = _settings.ai.embedding_model
+        self.semantic_cache = SemanticQueryCache(ttl=_settings.ai.semantic_cache_ttl)
+        try:
+            from langchain_openai import OpenAIEmbeddings
+
+            self.query_embedder = OpenAIEmbeddings(
+                model=self.embedding_model,
+                openai_api_key=self.api_key,
+            )
+        except Exception as e:
+            logger.warning("Query embeddings unavailable, semantic cache disabled", error=str(e))
+            self.query_embedder = None
+
+        # Upper bound on RAG answer generation, including the hedged fallback
+        self.rag_timeout = _settings.ai.rag_timeout
+
+        # Overlap a sources-free generation with document search (opt-in)
+        self.speculative_generation = os.getenv("KNOWLEDGE_AGENT_SPECULATIVE", "0") == "1"
+
+        # Max in-flight RAG pipelines for execute_many
+        self.batch_concurrency = int(os.getenv("KNOWLEDGE_AGENT_CONCURRENCY", "16"))
+
         # Runtime state
         self.is_running = False
 
         logger.info("Knowledge Agent initialized with GPT-5", model=self.model)
 
+    @property
+    def knowledge_llm(self) -> Any:
+        """The knowledge LLM; the shared client for the current event loop unless overridden."""
+        if self._knowledge_llm is _SHARED_LLM:
+            return _shared_knowledge_llm(self.model, self.api_key)
+        return self._knowledge_llm
+
+    @knowledge_llm.setter
+    def knowledge_llm(self, value: Any) -> None:
+        self._knowledge_llm = value
+
     async def start(self) -> None:
         """Start the knowledge agent."""
         self.is_running = True
@@ -170,7 +343,7 @@ class KnowledgeAgent:
         Returns:
             Knowledge retrieval results
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         try:
             # Prepare and execute search
@@ -178,13 +351,81 @@ class KnowledgeAgent:
             result = await self._perform_knowledge_search(query)
 
             # Build and return response
-            response = self._build_knowledge_success_response(result, start_time, metadata)
-            self._log_knowledge_completion(query.query, result, start_time)
+            execution_time = time.perf_counter() - start_time
+            response = self._build_knowledge_success_response(result, execution_time, metadata)
+            self._log_knowledge_completion(query.query, result, execution_time)
 
             return response
 
         except Exception as e:
-            return self._build_knowledge_error_response(e, start_time, metadata, locals())
+            execution_time = time.perf_counter() - start_time
+            return self._build_knowledge_error_response(e, execution_time, metadata, locals())
+
+    async def execute_many(
+        self,
+        batch: list[tuple[list[dict[str, Any]], dict[str, Any], dict[str, Any]]],
+    ) -> list[dict[str, Any] | BaseException]:
+        """
+        Execute several knowledge retrieval tasks concurrently.
+
+        Args:
+            batch: (messages, context, metadata) tuples, one per task
+
+        Returns:
+            Results in input order; each is an ``execute`` response or the
+            exception raised for that item
+        """
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+
+        async def _run_one(item: tuple[list[dict[str, Any]], dict[str, Any], dict[str, Any]]) -> dict[str, Any]:
+            async with semaphore:
+                return await self.execute(*item)
+
+        return await asyncio.gather(*(_run_one(item) for item in batch), return_exceptions=True)
+
+    async def execute_stream(
+        self,
+        messages: list[dict[str, Any]],
+        context: dict[str, Any],
+        metadata: dict[str, Any],
+    ) -> AsyncIterator[str]:
+        """
+        Execute knowledge retrieval and stream the answer as it is generated.
+
+        Sources are retrieved up front; answer text is then yielded chunk by
+        chunk from ``knowledge_llm.astream`` so callers (e.g. SSE routes) can
+        forward the first tokens before generation finishes. Falls back to the
+        non-streaming providers if the model fails before emitting anything.
+
+        Args:
+            messages: Conversation messages
+            context: Execution context
+            metadata: Additional metadata
+
+        Yields:
+            Answer text chunks
+        """
+        query = self._prepare_knowledge_query(messages, context)
+        sources = await self._search_documents(query)
+        if not sources:
+            yield self._create_no_sources_response(query.query)
+            return
+
+        context_data = self._prepare_rag_context(sources, query.query, self._get_current_time())
+        emitted = False
+        if self.knowledge_llm:
+            try:
+                async for chunk in self.knowledge_llm.astream(self._build_rag_messages(context_data)):
+                    if chunk.content:
+                        emitted = True
+                        yield chunk.content
+                return
+            except Exception as e:
+                logger.error("RAG answer streaming failed", error=str(e), emitted=emitted)
+                if emitted:
+                    return
+
+        yield await self._try_fallback_rag(context_data, sources)
 
     def _prepare_knowledge_query(
         self, messages: list[dict[str, Any]], context: dict[str, Any]
@@ -201,14 +442,12 @@ class KnowledgeAgent:
         )
 
     def _build_knowledge_success_response(
-        self, result: KnowledgeResponse, start_time: float, metadata: dict[str, Any]
+        self, result: KnowledgeResponse, execution_time: float, metadata: dict[str, Any]
     ) -> dict[str, Any]:
         """Build success response from knowledge search result."""
-        execution_time = time.time() - start_time
-
         return {
             "response": result.answer,
-            "knowledge_data": result.dict(),
+            "knowledge_data": result.model_dump(mode="json"),
             "execution_time": execution_time,
             "metadata": {
                 "agent": "knowledge_agent",
@@ -220,11 +459,9 @@ class KnowledgeAgent:
         }
 
     def _log_knowledge_completion(
-        self, query: str, result: KnowledgeResponse, start_time: float
+        self, query: str, result: KnowledgeResponse, execution_time: float
     ) -> None:
         """Log information about completed knowledge search."""
-        execution_time = time.time() - start_time
-
         logger.info(
             "Knowledge search completed",
             query=query,
@@ -234,10 +471,9 @@ class KnowledgeAgent:
         )
 
     def _build_knowledge_error_response(
-        self, error: Exception, start_time: float, metadata: dict[str, Any], local_vars: dict[str, Any]
+        self, error: Exception, execution_time: float, metadata: dict[str, Any], local_vars: dict[str, Any]
     ) -> dict[str, Any]:
         """Build error response when knowledge execution fails."""
-        execution_time = time.time() - start_time
         query_info = self._extract_query_info_for_error(local_vars)
 
         logger.error(
@@ -267,28 +503,127 @@ class KnowledgeAgent:
     async def _perform_knowledge_search(
         self, query: KnowledgeQuery
     ) -> KnowledgeResponse:
-        """Perform knowledge search and RAG."""
+        """Perform knowledge search and RAG, consulting the semantic cache first."""
+        query_vector = await self._embed_query(query.query)
+        signature = self._query_signature(query)
+        if query_vector is not None:
+            cached = self.semantic_cache.lookup(query_vector, signature)
+            if cached is not None:
+                logger.info("Semantic cache hit", query=query.query)
+                return cached.model_copy(
+                    update={"metadata": {**cached.metadata, "cache": "semantic_hit"}}
+                )
+
+        result = await self._run_knowledge_pipeline(query)
+
+        if query_vector is not None and result.sources and not result.metadata.get("speculative"):
+            self.semantic_cache.add(query_vector, signature, result)
+        return result
+
+    async def _embed_query(self, text: str) -> np.ndarray | None:
+        """Embed and normalize a query for the semantic cache; None on failure."""
+        if self.query_embedder is None:
+            return None
+        try:
+            vector = await self.query_embedder.aembed_query(text)
+            return SemanticQueryCache.normalize(vector)
+        except Exception as e:
+            logger.warning("Query embedding failed, bypassing semantic cache", error=str(e))
+            return None
+
+    def _query_signature(self, query: KnowledgeQuery) -> tuple[Any, ...]:
+        """Search parameters that must match for a cached answer to be reused."""
+        return (
+            query.top_k,
+            query.semantic_search,
+            query.include_metadata,
+            tuple(sorted((k, repr(v)) for k, v in query.filters.items())),
+        )
+
+    async def _run_knowledge_pipeline(
+        self, query: KnowledgeQuery
+    ) -> KnowledgeResponse:
+        """Run the uncached search -> generate -> score pipeline.
+
+        With speculative generation enabled, a sources-free answer is started
+        alongside the search and used only if the search comes back with no
+        sources at all.
+        """
+        speculative_task = None
+        if self.speculative_generation and self.knowledge_llm:
+            speculative_task = asyncio.create_task(self._generate_speculative(query.query))
+
         # Step 1: Search for relevant documents
-        sources = await self._search_documents(query)
+        try:
+            sources = await self._search_documents(query)
+        except BaseException:
+            if speculative_task is not None:
+                speculative_task.cancel()
+            raise
 
         # Step 2: Generate answer using GPT-5 with retrieved context
-        answer = await self._generate_answer_with_rag(query, sources)
+        answer = None
+        if speculative_task is not None:
+            answer = await self._resolve_speculative(speculative_task, sources)
+        speculative = answer is not None
+        if answer is None:
+            answer = await self._generate_answer_with_rag(query, sources)
 
         # Step 3: Calculate confidence score
         confidence_score = self._calculate_confidence_score(sources)
 
+        metadata = {
+            "query": query.query,
+            "search_method": ("semantic" if query.semantic_search else "keyword"),
+            "total_sources": len(sources),
+        }
+        if speculative:
+            metadata["speculative"] = True
+
         return KnowledgeResponse(
             answer=answer,
-            sources=sources,
+            sources=self._validate_sources(sources),
             confidence_score=confidence_score,
-            metadata={
-                "query": query.query,
-                "search_method": ("semantic" if query.semantic_search else "keyword"),
-                "total_sources": len(sources),
-            },
+            metadata=metadata,
         )
 
-    async def _search_documents(self, query: KnowledgeQuery) -> list[KnowledgeDocument]:
+    def _validate_sources(self, sources: list[_RetrievedDocument]) -> list[KnowledgeDocument]:
+        """Validate hits into KnowledgeDocuments, dropping any that fail rather than the response."""
+        try:
+            return _DOCUMENT_LIST_ADAPTER.validate_python(sources, from_attributes=True)
+        except ValidationError:
+            documents: list[KnowledgeDocument] = []
+            for source in sources:
+                try:
+                    documents.append(KnowledgeDocument.model_validate(source, from_attributes=True))
+                except ValidationError as e:
+                    logger.warning("Dropping invalid source", id=source.id, error=str(e))
+            return documents
+
+    async def _resolve_speculative(
+        self, task: "asyncio.Task[str]", sources: list[_RetrievedDocument]
+    ) -> str | None:
+        """Return the speculative answer if nothing was retrieved, else cancel it."""
+        if sources:
+            task.cancel()
+            return None
+        try:
+            return await task
+        except Exception as e:
+            logger.warning("Speculative generation failed, using RAG path", error=str(e))
+            return None
+
+    async def _generate_speculative(self, query: str) -> str:
+        """Answer the query without retrieved sources, flagged as unverified."""
+        response = await self.knowledge_llm.ainvoke(
+            [
+                SystemMessage(content=SPECULATIVE_SYSTEM_PROMPT),
+                HumanMessage(content=query),
+            ]
+        )
+        return response.content.strip()
+
+    async def _search_documents(self, query: KnowledgeQuery) -> list[_RetrievedDocument]:
         """Search for relevant documents with low complexity and clear flow."""
         try:
             raw_results: list[dict[str, Any]] = []
@@ -311,16 +646,22 @@ class KnowledgeAgent:
             logger.error("Document search failed", error=str(e), query=query.query)
             return []
 
+    def _resolve_db_search_methods(self) -> None:
+        """Look up the db_manager search entry points once instead of per request."""
+        self._db_semantic_search_fn = getattr(self.db_manager, "semantic_search", None)
+        self._db_search_fn = getattr(self.db_manager, "search", None)
+
     async def _db_manager_search(self, query: KnowledgeQuery) -> list[dict[str, Any]]:
         """Select and execute the appropriate db_manager search method."""
         try:
-            semantic_ok = query.semantic_search and hasattr(self.db_manager, "semantic_search")
-            method_name = "semantic_search" if semantic_ok else ("search" if hasattr(self.db_manager, "search") else None)
-            if not method_name:
-                logger.warning("db_manager present but no compatible search method", available=dir(self.db_manager))
+            search_fn = (query.semantic_search and self._db_semantic_search_fn) or self._db_search_fn
+            if search_fn is None:
+                logger.warning(
+                    "db_manager present but no compatible search method",
+                    db_manager=type(self.db_manager).__name__,
+                )
                 return []
 
-            search_fn = getattr(self.db_manager, method_name)
             results = await search_fn(
                 query=query.query,
                 top_k=query.top_k,
@@ -332,9 +673,9 @@ class KnowledgeAgent:
             logger.error("db_manager search failed", error=str(e))
             return []
 
-    def _convert_raw_results(self, raw_results: list[dict[str, Any]]) -> list[KnowledgeDocument]:
-        """Convert raw search rows into KnowledgeDocument objects."""
-        sources: list[KnowledgeDocument] = []
+    def _convert_raw_results(self, raw_results: list[dict[str, Any]]) -> list[_RetrievedDocument]:
+        """Convert raw search rows into retrieved documents."""
+        sources: list[_RetrievedDocument] = []
         for i, item in enumerate(raw_results or []):
             try:
                 document = self._convert_single_result(item, i)
@@ -344,15 +685,15 @@ class KnowledgeAgent:
                 logger.warning("Failed to convert search result", error=str(conv_err))
         return sources
 
-    def _convert_single_result(self, item: dict[str, Any], index: int) -> KnowledgeDocument | None:
-        """Convert a single raw result item to KnowledgeDocument.
+    def _convert_single_result(self, item: dict[str, Any], index: int) -> _RetrievedDocument | None:
+        """Convert a single raw result item to a retrieved document.
 
         Args:
             item: Raw result item
             index: Item index for fallback ID
 
         Returns:
-            KnowledgeDocument or None if conversion fails
+            _RetrievedDocument or None if conversion fails
         """
         if not isinstance(item, dict):
             return None
@@ -360,7 +701,14 @@ class KnowledgeAgent:
         metadata = self._extract_metadata(item)
         document_fields = self._extract_document_fields(item, metadata, index)
 
-        return KnowledgeDocument(**document_fields)
+        relevance = document_fields["relevance_score"]
+        if not 0.0 <= relevance <= 1.0:
+            raise ValueError(f"relevance score {relevance} outside [0, 1]")
+        # Reject rows KnowledgeDocument would refuse before they reach the LLM prompt
+        for name in ("title", "content", "source"):
+            if not isinstance(document_fields[name], str):
+                raise ValueError(f"{name} must be a string, got {type(document_fields[name]).__name__}")
+        return _RetrievedDocument(**document_fields)
 
     def _extract_metadata(self, item: dict[str, Any]) -> dict[str, Any]:
         """Extract metadata from raw result item.
@@ -418,7 +766,7 @@ class KnowledgeAgent:
             return 0.0
 
     async def _generate_answer_with_rag(
-        self, query: KnowledgeQuery, sources: list[KnowledgeDocument]
+        self, query: KnowledgeQuery, sources: list[_RetrievedDocument]
     ) -> str:
         """Generate answer using RAG with GPT-5."""
         # Handle no sources case early
@@ -441,14 +789,10 @@ class KnowledgeAgent:
 
     def _get_current_time(self) -> str:
         """Get current time formatted for context."""
-        from datetime import datetime
-        import pytz
-
-        miami_tz = pytz.timezone('America/New_York')
-        return datetime.now(miami_tz).strftime('%A, %B %d, %Y at %I:%M %p %Z')
+        return _format_context_minute(int(time.time() // 60))
 
     def _prepare_rag_context(
-        self, sources: list[KnowledgeDocument], query: str, current_time: str
+        self, sources: list[_RetrievedDocument], query: str, current_time: str
     ) -> dict[str, str]:
         """Prepare all RAG context components."""
         delimited_sources = self._format_sources_block(sources)
@@ -465,49 +809,88 @@ class KnowledgeAgent:
         }
 
     async def _generate_rag_answer(
-        self, context_data: dict[str, str], sources: list[KnowledgeDocument]
+        self, context_data: dict[str, str], sources: list[_RetrievedDocument]
     ) -> str:
-        """Generate RAG answer using available providers."""
+        """Generate RAG answer, hedging a slow primary call with the fallback provider.
+
+        OpenAI gets RAG_HEDGE_DELAY seconds on its own; after that (or as soon as
+        it fails) the fallback provider is raced against it and the first
+        successful answer wins. The whole race is bounded by ``rag_timeout``.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.rag_timeout
+        pending = {asyncio.create_task(self._try_openai_rag(context_data))}
+        hedged = False
         try:
-            # Try OpenAI first
-            return await self._try_openai_rag(context_data)
-        except Exception as e:
-            logger.error("RAG answer generation failed", error=str(e))
-            # Fall back to alternative methods
-            return await self._try_fallback_rag(context_data, sources)
+            while pending:
+                window = deadline - loop.time()
+                if not hedged:
+                    window = min(window, RAG_HEDGE_DELAY)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(window, 0.0), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    logger.error("RAG answer generation failed", error=str(task.exception()))
+
+                if not hedged:
+                    hedged = True
+                    if self.fallback_provider:
+                        pending.add(asyncio.create_task(self._call_fallback_provider(context_data, sources)))
+                elif not done:
+                    logger.error("RAG answer generation timed out", timeout=self.rag_timeout)
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # Create basic summary as last resort
+        return self._create_fallback_summary(sources, context_data)
 
     async def _try_openai_rag(self, context_data: dict[str, str]) -> str:
         """Try generating RAG answer using OpenAI."""
         if not self.knowledge_llm:
             raise Exception("OpenAI client not available")
 
-        messages = [
+        response = await self.knowledge_llm.ainvoke(self._build_rag_messages(context_data))
+        return response.content.strip()
+
+    def _build_rag_messages(self, context_data: dict[str, str]) -> list[SystemMessage | HumanMessage]:
+        """Build the chat messages for a RAG generation call."""
+        return [
             SystemMessage(content=context_data["system_msg"]),
             HumanMessage(content=context_data["user_msg"]),
         ]
-        response = await self.knowledge_llm.ainvoke(messages)
-        return response.content.strip()
 
     async def _try_fallback_rag(
-        self, context_data: dict[str, str], sources: list[KnowledgeDocument]
+        self, context_data: dict[str, str], sources: list[_RetrievedDocument]
     ) -> str:
         """Try fallback provider or create summary when primary fails."""
         if self.fallback_provider:
             try:
-                fallback_response = await self.fallback_provider.generate_response(
-                    user_input=context_data["user_msg"],
-                    context={"type": "knowledge_rag", "sources_count": len(sources)}
-                )
-                logger.info("Used fallback provider for RAG generation")
-                return fallback_response
+                return await self._call_fallback_provider(context_data, sources)
             except Exception as fallback_error:
                 logger.error("Fallback provider also failed", error=str(fallback_error))
 
         # Create basic summary as last resort
         return self._create_fallback_summary(sources, context_data)
 
+    async def _call_fallback_provider(
+        self, context_data: dict[str, str], sources: list[_RetrievedDocument]
+    ) -> str:
+        """Generate a RAG answer with the fallback provider; raises on failure."""
+        fallback_response = await self.fallback_provider.generate_response(
+            user_input=context_data["user_msg"],
+            context={"type": "knowledge_rag", "sources_count": len(sources)}
+        )
+        logger.info("Used fallback provider for RAG generation")
+        if isinstance(fallback_response, dict):
+            return fallback_response.get("response", "")
+        return fallback_response
+
     def _create_fallback_summary(
-        self, sources: list[KnowledgeDocument], context_data: dict[str, str]
+        self, sources: list[_RetrievedDocument], context_data: dict[str, str]
     ) -> str:
         """Create a basic summary when all providers fail."""
         # Extract query from user message context
@@ -521,12 +904,12 @@ class KnowledgeAgent:
 
         # Add footnotes if available in context
         if "## Footnotes" in context_data["user_msg"]:
-            footnotes_section = context_data["user_msg"].split("## Footnotes\n")[1]
+            footnotes_section = context_data["user_msg"].split("## Footnotes\n")[1].split("\n\n## ")[0]
             summary_parts.append(footnotes_section)
 
         return "\n\n".join(summary_parts)[:1500]
 
-    def _calculate_confidence_score(self, sources: list[KnowledgeDocument]) -> float:
+    def _calculate_confidence_score(self, sources: list[_RetrievedDocument]) -> float:
         """Calculate confidence score based on sources."""
         if not sources:
             return 0.0
@@ -549,64 +932,80 @@ class KnowledgeAgent:
         Aligned with OpenAI prompt engineering guidance: be explicit about role,
         constraints, formatting, and refusal to fabricate.
         """
-        return (
-            "You are Cartrita's Knowledge Agent. Your job is to synthesize accurate, well-attributed, and"
-            " actionable answers strictly from the provided sources. Do not invent facts. If information"
-            " is missing or uncertain, say so and propose next steps. Keep explanations clear and concise."
-        )
+        return KNOWLEDGE_SYSTEM_PROMPT
 
     def _build_knowledge_prompt(self, *, query: str, current_time: str, sources_block: str, footnotes: str) -> str:
-        """Build the user prompt with clear delimiters and a strict output structure."""
-        return (
-            f"# Knowledge Synthesis Request\n"
-            f"Time: {current_time}\n"
-            f"Query: \"{query}\"\n\n"
-            f"## Sources (do not assume anything not contained below)\n"
-            f"<<<SOURCES>>>\n{sources_block}\n<<<END_SOURCES>>>\n\n"
-            f"## Instructions\n"
-            f"- Base the answer only on the sources.\n"
-            f"- Identify conflicts and note currency/recency.\n"
-            f"- Separate facts from analysis.\n"
-            f"- Use the output structure exactly.\n\n"
-            f"## Output Structure\n"
-            f"### Direct Answer\n"
-            f"Provide a 2-3 sentence direct answer.\n\n"
-            f"### Details\n"
-            f"Synthesize key points from multiple sources, highlighting agreements and disagreements.\n\n"
-            f"### Sources\n"
-            f"Cite using footnote numbers like [1], [2] that correspond to the list below.\n\n"
-            f"### Gaps or Uncertainty\n"
-            f"State what is unknown or requires verification; suggest next steps or search refinements.\n\n"
-            f"### Related Insights\n"
-            f"Offer 1-3 concise related insights.\n\n"
-            f"## Footnotes\n{footnotes}\n"
+        """Build the user prompt with clear delimiters and a strict output structure.
+
+        Static instructions lead so the prompt prefix stays cacheable; per-request
+        sources, time and query are appended last.
+        """
+        return "".join(
+            (
+                _PROMPT_HEAD,
+                sources_block,
+                _PROMPT_MID,
+                footnotes,
+                _PROMPT_TAIL,
+                f"Time: {current_time}\nQuery: \"{query}\"\n",
+            )
         )
 
-    def _format_sources_block(self, sources: list[KnowledgeDocument]) -> str:
-        """Format the retrieved sources into a delimited block with minimal noise."""
+    def _format_sources_block(self, sources: list[_RetrievedDocument]) -> str:
+        """Format the retrieved sources into a delimited block with minimal noise.
+
+        Sources whose excerpt repeats an earlier one (same source and text) are
+        emitted as a back-reference so the model does not re-encode it.
+        """
         lines: list[str] = []
-        for idx, s in enumerate(sources, start=1):
+        seen: dict[str, int] = {}
+        for idx, (s, excerpt) in enumerate(zip(sources, self._truncate_excerpts(sources)), start=1):
+            digest = hashlib.sha256((s.source + excerpt).encode()).hexdigest()
+            first_idx = seen.setdefault(digest, idx)
             lines.append(
                 "\n".join(
                     [
                         f"[{idx}] Title: {s.title}",
                         f"URL/Source: {s.source}",
-                        f"Excerpt: {s.content[:1200]}",
+                        f"Excerpt: {excerpt}" if first_idx == idx else f"Excerpt: (same as [{first_idx}])",
                     ]
                 )
             )
         return "\n\n".join(lines)
 
-    def _format_source_footnotes(self, sources: list[KnowledgeDocument]) -> str:
+    def _truncate_excerpts(self, sources: list[_RetrievedDocument]) -> list[str]:
+        """Cut each source to an equal share of SOURCE_TOKEN_BUDGET tokens.
+
+        Truncating by tokens rather than characters packs more English text
+        into the prompt while keeping dense (CJK, code) sources within budget.
+        """
+        budget = SOURCE_TOKEN_BUDGET // max(len(sources), 1)
+        encoder = _token_encoder(self.model)
+        if encoder is None:
+            return [s.content[: budget * _AVG_CHARS_PER_TOKEN] for s in sources]
+
+        char_cap = budget * _MAX_CHARS_PER_TOKEN
+        texts = [s.content[:char_cap] for s in sources]
+        token_ids = encoder.encode_batch(texts, disallowed_special=())
+        return [
+            text if len(ids) <= budget else encoder.decode(ids[:budget])
+            for text, ids in zip(texts, token_ids)
+        ]
+
+    def _format_source_footnotes(self, sources: list[_RetrievedDocument]) -> str:
         """Create a compact footnote list mapping [n] to source metadata."""
-        rows: list[str] = []
-        for idx, s in enumerate(sources, start=1):
-            score = f"{s.relevance_score:.2f}" if isinstance(s.relevance_score, float) else ""
-            rows.append(f"[{idx}] {s.title} — {s.source} (relevance {score})")
-        return "\n".join(rows)
+        return "\n".join(
+            f"[{idx}] {s.title} — {s.source} (relevance {s.relevance_score:.2f})"
+            for idx, s in enumerate(sources, start=1)
+        )
 
     def _extract_knowledge_query(self, messages: list[dict[str, Any]]) -> str:
         """Extract knowledge query from conversation messages."""
+        # Fast path: the latest message is almost always the user's query
+        last = messages[-1] if messages else None
+        if isinstance(last, dict) and last.get("role") == "user" and last.get("content"):
+            return last["content"]
+
         for message in reversed(messages):
             if isinstance(message, dict) and message.get("role") == "user":
                 content = message.get("content", "")
@@ -617,5 +1016,7 @@ class KnowledgeAgent:
 
     async def reload_configuration(self) -> None:
         """Reload agent configuration."""
-        # Reload settings if needed
+        # Cached answers may be stale against the reloaded configuration
+        self.semantic_cache.clear()
+        self._resolve_db_search_methods()
         logger.info("Knowledge Agent configuration reloaded")
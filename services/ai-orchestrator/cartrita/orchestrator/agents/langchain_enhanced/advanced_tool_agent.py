@@ -3,41 +3,190 @@ Advanced Tool Agent with LangChain
 Implements sophisticated tool management and execution patterns
 """
 
-from typing import Any, Dict, List, Optional
-from datetime import datetime
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import chain
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from cachetools import LRUCache, TTLCache
+from pydantic import ValidationError
+
+try:
+    import orjson  # type: ignore
+
+    ORJSON_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency path
+    ORJSON_AVAILABLE = False
 
 from cartrita.orchestrator.utils.llm_factory import create_chat_openai
-from .base_tool import ToolCategory, AdvancedCartritaTool
+from .base_tool import METRICS_TABLE, AdvancedCartritaTool, ToolCategory, ToolMetricsTable
 from .tools_math import MathCalculatorTool
 from .tools_filesystem import FileSystemTool
 from .tools_websearch import WebSearchTool
 from .tools_code import CodeExecutorTool
+from .tools_batch import BatchTool
 
 
-try:
-    from langchain.agents import AgentExecutor, create_openai_tools_agent  # type: ignore
-    from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder  # type: ignore
-    from langchain.memory import ConversationBufferMemory  # type: ignore
-    LANGCHAIN_AVAILABLE = True
-except Exception:  # pragma: no cover - optional dependency path
-    LANGCHAIN_AVAILABLE = False
-
-    class ConversationBufferMemory:  # type: ignore
-        def __init__(self, memory_key: str = "chat_history", return_messages: bool = True, **kwargs):
-            self.memory_key = memory_key
-            self.return_messages = return_messages
-
-        def clear(self):
-            pass
+# The agent, prompt, memory and callback pieces of LangChain are imported on first use;
+# consumers that only inspect tool configuration or metrics never need them. (BaseTool
+# itself still comes in eagerly through base_tool, since the tools subclass it.)
+# None = not probed yet.
+_langchain: Any = None
 
-    class ChatPromptTemplate:  # type: ignore
-        @classmethod
-        def from_messages(cls, messages):
-            return messages
 
-    class MessagesPlaceholder:  # type: ignore
-        def __init__(self, variable_name: str):
-            self.variable_name = variable_name
+def _load_langchain() -> Any:
+    """Return a namespace of the LangChain pieces the agent uses, or False if unavailable"""
+    global _langchain
+    if _langchain is None:
+        try:
+            from langchain.agents import AgentExecutor, create_openai_tools_agent  # type: ignore
+            from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder  # type: ignore
+            from langchain.memory import ConversationTokenBufferMemory  # type: ignore
+            from langchain_core.language_models import BaseLanguageModel  # type: ignore
+            from langchain_community.callbacks import get_openai_callback  # type: ignore
+            from langchain_core.callbacks import BaseCallbackHandler  # type: ignore
+
+            class ToolUseRecorder(BaseCallbackHandler):
+                """Collects the names of tools the executor runs, in call order"""
+
+                # A list append is cheap; dispatching it inline skips the default
+                # thread-pool hop LangChain makes for sync handlers on async runs
+                run_inline = True
+
+                def __init__(self):
+                    self.tools_used: List[str] = []
+
+                def on_tool_start(self, serialized, input_str, **kwargs):
+                    self.tools_used.append((serialized or {}).get("name", ""))
+
+            _langchain = SimpleNamespace(
+                ToolUseRecorder=ToolUseRecorder,
+                AgentExecutor=AgentExecutor,
+                create_openai_tools_agent=create_openai_tools_agent,
+                ChatPromptTemplate=ChatPromptTemplate,
+                MessagesPlaceholder=MessagesPlaceholder,
+                ConversationTokenBufferMemory=ConversationTokenBufferMemory,
+                BaseLanguageModel=BaseLanguageModel,
+                get_openai_callback=get_openai_callback,
+            )
+        except Exception:  # pragma: no cover - optional dependency path
+            _langchain = False
+    return _langchain
+
+
+class _SimpleMemory:
+    """Stand-in for LangChain memory when token-capped memory can't be used"""
+
+    def __init__(self, memory_key: str = "chat_history", return_messages: bool = True, **kwargs):
+        self.memory_key = memory_key
+        self.return_messages = return_messages
+
+    def clear(self):
+        pass
+
+
+class _NoUsageCallback:
+    total_cost = 0.0
+    total_tokens = 0
+
+
+@contextmanager
+def _usage_callback():
+    """Track OpenAI token spend for the enclosed calls when LangChain is available"""
+    langchain = _load_langchain()
+    if not langchain:
+        yield _NoUsageCallback()
+        return
+    with langchain.get_openai_callback() as cb:
+        # Token accounting is a few additions under a lock; run it inline too
+        cb.run_inline = True
+        yield cb
+
+
+# Sync entry points run on one long-lived loop: async HTTP clients (e.g. ChatOpenAI's)
+# pool connections bound to the loop they were first used on, so a fresh asyncio.run
+# per call would leave them pointing at a closed loop
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_loop_lock = threading.Lock()
+
+
+def _run_sync(coro: Any) -> Any:
+    """Run ``coro`` to completion on the shared background loop and return its result"""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="advanced-tool-agent-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
+
+
+# Tools every agent starts with, in registration order
+DEFAULT_TOOL_CLASSES = (MathCalculatorTool, FileSystemTool, WebSearchTool, CodeExecutorTool)
+
+# Usage history keeps only a prefix of each result
+HISTORY_RESULT_MAX_CHARS = 2048
+
+# Cached answers expire after this many seconds even if nothing else invalidates them
+RESPONSE_CACHE_TTL = float(os.getenv("CARTRITA_AGENT_RESPONSE_CACHE_TTL", "300"))
+
+# Keyword -> tool category mapping used for tool recommendations
+KEYWORD_MAPPING: Dict[ToolCategory, tuple] = {
+    ToolCategory.COMPUTATION: ("calculate", "math", "compute", "formula"),
+    ToolCategory.FILE_SYSTEM: ("file", "read", "write", "save", "load"),
+    ToolCategory.WEB_SEARCH: ("search", "find", "lookup", "web", "internet"),
+    ToolCategory.CODE_EXECUTION: ("code", "script", "execute", "run", "program"),
+}
+_KEYWORD_TO_CATEGORY: Dict[str, ToolCategory] = {
+    keyword: category for category, keywords in KEYWORD_MAPPING.items() for keyword in keywords
+}
+# One alternation over every keyword, bounded like [a-z]+ tokens, so a single C-level
+# scan of the query finds all keyword hits
+_KEYWORD_RE = re.compile(
+    r"(?<![a-z])(" + "|".join(sorted(map(re.escape, _KEYWORD_TO_CATEGORY), key=len, reverse=True)) + r")(?![a-z])"
+)
+
+@lru_cache(maxsize=1)
+def _agent_prompt() -> Any:
+    """Static agent prompt, built once on first agent creation"""
+    langchain = _load_langchain()
+    return langchain.ChatPromptTemplate.from_messages([
+        ("system", """You are an advanced tool management agent. You have access to various tools
+    to help users accomplish tasks. Always:
+    1. Choose the most appropriate tool for each task
+    2. Consider cost and performance implications
+    3. Provide clear explanations of tool choices
+    4. Monitor tool performance and suggest alternatives if needed
+    5. When several tool calls don't depend on each other, make them together in one batch_tools call
+
+    Available tools: {tool_names}
+    Session cost limit: ${max_cost}
+    Current session cost: ${current_cost}"""),
+        langchain.MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}"),
+        langchain.MessagesPlaceholder(variable_name="agent_scratchpad")
+    ])
+
+
+# Single-shot planner prompt for JIT planning mode: the LLM emits the whole
+# tool-call DAG at once so independent calls can run concurrently
+_JIT_PLAN_PROMPT = """You plan tool calls for a user request. Reply with ONLY a JSON array, no prose.
+Each element is {{"id": "<unique id>", "tool": "<tool name>", "args": {{...}}, "deps": ["<id>", ...]}}.
+List in "deps" every call whose output this call needs, and reference that output inside
+string args as "$<id>". Calls without shared deps run in parallel.
+
+Available tools:
+{tool_descriptions}"""
 
 
 class AdvancedToolAgent:
@@ -51,11 +200,27 @@ class AdvancedToolAgent:
     - Automatic tool selection
     """
 
+    # Agents may be created per session; slots drop the per-instance __dict__
+    __slots__ = (
+        "llm", "max_cost_per_session", "current_session_cost", "enable_tool_recommendation",
+        "enable_jit_planning", "verbose", "tools", "tool_categories", "history_limit",
+        "tool_usage_history", "memory_token_limit", "_memory", "_response_cache", "_memory_version", "agent",
+        "agent_executor", "_stateless_executor", "_cost_lock", "_reserved_cost", "_tool_list", "_agent_dirty", "_tool_names_cached", "_tool_set_key",
+        "_tools_version", "_recommendation_cache", "_category_tools", "_export_cache", "_buckets",
+    )
+
     def __init__(
         self,
         llm: Optional[Any] = None,
         max_cost_per_session: float = 100.0,
         enable_tool_recommendation: bool = True,
+        verbose: Optional[bool] = None,
+        response_cache_size: int = 512,
+        response_cache_ttl: float = RESPONSE_CACHE_TTL,
+        enable_jit_planning: bool = False,
+        history_limit: int = 1000,
+        memory_token_limit: int = 2048,
+        initialize_default_tools: bool = True,
         **kwargs
     ):
         # Initialize LLM
@@ -67,77 +232,146 @@ class AdvancedToolAgent:
         # Configuration
         self.max_cost_per_session = max_cost_per_session
         self.current_session_cost = 0.0
+        # Estimated cost of runs still in flight; checked with the spent cost under the lock
+        # so concurrent runs can't each pass the limit check on the same stale total
+        self._cost_lock = threading.Lock()
+        self._reserved_cost = 0.0
         self.enable_tool_recommendation = enable_tool_recommendation
+        # Plan all tool calls up front and run independent ones concurrently
+        self.enable_jit_planning = enable_jit_planning
+        # Executor step tracing prints synchronously; keep it off unless asked for
+        self.verbose = verbose if verbose is not None else os.getenv("CARTRITA_AGENT_VERBOSE", "0") == "1"
 
         # Tool management
         self.tools: Dict[str, AdvancedCartritaTool] = {}
-        self.tool_categories: Dict[ToolCategory, List[str]] = {}
-        self.tool_usage_history: List[Dict[str, Any]] = []
+        self.tool_categories: Dict[ToolCategory, Set[str]] = {}
+        # Bounded so a long-running orchestrator doesn't accumulate results forever
+        self.history_limit = history_limit
+        self.tool_usage_history: Deque[Dict[str, Any]] = deque(maxlen=history_limit)
+
+        # Exact-match cache of agent outputs keyed by query + tool set
+        self._response_cache: TTLCache = TTLCache(maxsize=response_cache_size, ttl=response_cache_ttl)
+        # Bumped whenever a run changes conversation memory; part of the cache key
+        self._memory_version = 0
+
+        # Memory for tool usage patterns, token-capped so prompts don't grow with the session;
+        # created on first access so LangChain isn't imported until it's needed
+        self.memory_token_limit = memory_token_limit
+        self._memory = None
+
+        # Agent is built lazily on first execution and rebuilt only after tool changes
+        self.agent = None
+        self.agent_executor = None
+        # Same agent without conversation memory, for independent (batched) runs
+        self._stateless_executor = None
+        self._tool_list: List[AdvancedCartritaTool] = []
+        self._agent_dirty = True
+
+        # Tool-name strings used by every execution, refreshed on tool changes
+        self._tool_names_cached = ""
+        self._tool_set_key = ""
+        # Bumped on every tool change; keys the memoized recommendations
+        self._tools_version = 0
+        self._recommendation_cache: LRUCache = LRUCache(maxsize=256)
+        # Sorted tool names per keyword category, in KEYWORD_MAPPING order
+        self._category_tools: Tuple[Tuple[ToolCategory, Tuple[str, ...]], ...] = ()
+        self._export_cache: Optional[Tuple[Any, bytes]] = None
+        # Per-tool token buckets: tool name -> (tokens, last refill monotonic time)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
 
-        # Memory for tool usage patterns
-        self.memory = ConversationBufferMemory(
+        # Initialize default tools
+        if initialize_default_tools:
+            self._initialize_default_tools()
+
+    @classmethod
+    async def acreate(cls, **kwargs) -> "AdvancedToolAgent":
+        """Create an agent, constructing the default tools concurrently"""
+        agent = cls(initialize_default_tools=False, **kwargs)
+        await agent._ainitialize_default_tools()
+        return agent
+
+    @property
+    def memory(self):
+        """Chat memory shared with the agent executor"""
+        if self._memory is None:
+            self._memory = self._create_memory()
+        return self._memory
+
+    def _create_memory(self):
+        """Create chat memory, pruned to ``memory_token_limit`` when the LLM can count tokens"""
+        langchain = _load_langchain()
+        if langchain and isinstance(self.llm, langchain.BaseLanguageModel):
+            return langchain.ConversationTokenBufferMemory(
+                llm=self.llm,
+                memory_key="chat_history",
+                output_key="output",
+                return_messages=True,
+                max_token_limit=self.memory_token_limit
+            )
+        return _SimpleMemory(
             memory_key="chat_history",
+            output_key="output",
             return_messages=True
         )
 
-        # Initialize default tools
-        self._initialize_default_tools()
-
-        # Create agent
-        self._create_agent()
-
     def _initialize_default_tools(self):
         """Initialize default tool set"""
-        default_tools = [MathCalculatorTool(), FileSystemTool(), WebSearchTool(), CodeExecutorTool()]
+        self.add_tools([tool_cls() for tool_cls in DEFAULT_TOOL_CLASSES] + [self._create_batch_tool()])
+
+    async def _ainitialize_default_tools(self):
+        """Initialize default tool set, overlapping any blocking setup in the constructors"""
+        tools = await asyncio.gather(*(asyncio.to_thread(tool_cls) for tool_cls in DEFAULT_TOOL_CLASSES))
+        self.add_tools([*tools, self._create_batch_tool()])
 
-        for tool in default_tools:
-            self.add_tool(tool)
+    def _create_batch_tool(self) -> BatchTool:
+        """Batch tool that fans independent calls out over this agent's tools"""
+        batch = BatchTool()
+        batch._registry = self.tools
+        return batch
 
     def _create_agent(self):
         """Create LangChain agent with tools"""
-        if not LANGCHAIN_AVAILABLE:
+        langchain = _load_langchain()
+        if not langchain:
             # Gracefully degrade when LangChain is unavailable
             self.agent = None
             self.agent_executor = None
+            self._stateless_executor = None
             return
 
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are an advanced tool management agent. You have access to various tools
-            to help users accomplish tasks. Always:
-            1. Choose the most appropriate tool for each task
-            2. Consider cost and performance implications
-            3. Provide clear explanations of tool choices
-            4. Monitor tool performance and suggest alternatives if needed
-
-            Available tools: {tool_names}
-            Session cost limit: ${max_cost}
-            Current session cost: ${current_cost}"""),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad")
-        ])
-
-        tool_list = list(self.tools.values())
-        self.agent = create_openai_tools_agent(self.llm, tool_list, prompt)
-        self.agent_executor = AgentExecutor(
+        self._tool_list = list(self.tools.values())
+        self.agent = langchain.create_openai_tools_agent(self.llm, self._tool_list, _agent_prompt())
+        executor_options = dict(
             agent=self.agent,
-            tools=tool_list,
-            memory=self.memory,
-            verbose=True,
-            max_iterations=10
+            tools=self._tool_list,
+            verbose=self.verbose,
+            max_iterations=10,
+            handle_parsing_errors=True
         )
+        self.agent_executor = langchain.AgentExecutor(memory=self.memory, **executor_options)
+        self._stateless_executor = langchain.AgentExecutor(**executor_options)
+
+    def _ensure_agent(self):
+        """Rebuild the LangChain agent if tools changed since the last build"""
+        if self._agent_dirty or self.agent_executor is None:
+            self._create_agent()
+            self._agent_dirty = False
 
     def add_tool(self, tool: AdvancedCartritaTool):
         """Add a tool to the agent"""
-        self.tools[tool.name] = tool
+        self.add_tools([tool])
 
-        # Update category mapping
-        if tool.category not in self.tool_categories:
-            self.tool_categories[tool.category] = []
-        self.tool_categories[tool.category].append(tool.name)
+    def add_tools(self, tools: Iterable[AdvancedCartritaTool]):
+        """Add several tools with a single agent rebuild"""
+        for tool in tools:
+            self.tools[tool.name] = tool
+
+            # Update category mapping
+            self.tool_categories.setdefault(tool.category, set()).add(tool.name)
 
-        # Recreate agent with updated tools
-        self._create_agent()
+        # Rebuild agent lazily with updated tools
+        self._agent_dirty = True
+        self._refresh_tool_names()
 
     def remove_tool(self, tool_name: str) -> bool:
         """Remove a tool from the agent"""
@@ -149,77 +383,363 @@ class AdvancedToolAgent:
 
         # Update category mapping
         if tool.category in self.tool_categories:
-            self.tool_categories[tool.category] = [
-                name for name in self.tool_categories[tool.category]
-                if name != tool_name
-            ]
+            self.tool_categories[tool.category].discard(tool_name)
 
-        # Recreate agent
-        self._create_agent()
+        # Rebuild agent lazily
+        self._agent_dirty = True
+        self._refresh_tool_names()
         return True
 
+    def _refresh_tool_names(self):
+        """Recompute the cached tool-name strings after the tool set changes"""
+        self._tool_names_cached = ", ".join(self.tools)
+        self._tool_set_key = ",".join(sorted(self.tools))
+        self._category_tools = tuple(
+            (category, tuple(sorted(self.tool_categories[category])))
+            for category in KEYWORD_MAPPING
+            if self.tool_categories.get(category)
+        )
+        self._tools_version += 1
+
     def get_tool_recommendations(self, query: str) -> List[str]:
         """Get recommended tools for a query"""
         if not self.enable_tool_recommendation:
             return list(self.tools.keys())
 
-        query_lower = query.lower()
-        recommendations = []
+        return list(self._matched_tools(query)) or list(self.tools.keys())
 
+    def _matched_tools(self, query: str) -> Tuple[str, ...]:
+        """Tools whose category keywords appear in the query, memoized per tool-set version"""
+        query_lower = query.lower()
+        cache_key = (query_lower, self._tools_version)
+        cached = self._recommendation_cache.get(cache_key)
+        if cached is None:
+            cached = self._recommendation_cache[cache_key] = tuple(self._recommend(query_lower))
+        return cached
+
+    def _recommend(self, query_lower: str) -> List[str]:
+        """Keyword-based recommendation for an already lower-cased query"""
         # Simple keyword-based recommendation (can be enhanced with ML)
-        keyword_mapping = {
-            ToolCategory.COMPUTATION: ["calculate", "math", "compute", "formula"],
-            ToolCategory.FILE_SYSTEM: ["file", "read", "write", "save", "load"],
-            ToolCategory.WEB_SEARCH: ["search", "find", "lookup", "web", "internet"],
-            ToolCategory.CODE_EXECUTION: ["code", "script", "execute", "run", "program"]
-        }
-
-        for category, keywords in keyword_mapping.items():
-            if any(keyword in query_lower for keyword in keywords):
-                if category in self.tool_categories:
-                    recommendations.extend(self.tool_categories[category])
-
-        return recommendations if recommendations else list(self.tools.keys())
-
-    def execute_with_tools(self, query: str) -> str:
-        """Execute query using available tools"""
+        matched = {_KEYWORD_TO_CATEGORY[keyword] for keyword in _KEYWORD_RE.findall(query_lower)}
+
+        return list(chain.from_iterable(
+            names for category, names in self._category_tools if category in matched
+        ))
+
+    def _refill_bucket(self, tool: AdvancedCartritaTool, now: float) -> float:
+        """Refill a tool's token bucket (``rate_limit`` calls per minute) and return its tokens"""
+        capacity = float(tool.rate_limit)
+        tokens, last_refill = self._buckets.get(tool.name, (capacity, now))
+        tokens = min(capacity, tokens + (now - last_refill) * capacity / 60.0)
+        self._buckets[tool.name] = (tokens, now)
+        return tokens
+
+    def _rate_limit_wait(self, tool_names: Iterable[str]) -> Optional[Tuple[str, float]]:
+        """Return (tool, seconds to wait) for the first rate-limited tool with an empty bucket"""
+        now = time.monotonic()
+        for name in tool_names:
+            tool = self.tools.get(name)
+            if tool is None or not tool.rate_limit:
+                continue
+            tokens = self._refill_bucket(tool, now)
+            if tokens < 1.0:
+                return name, (1.0 - tokens) * 60.0 / tool.rate_limit
+        return None
+
+    def _consume_rate_tokens(self, tool_names: Iterable[str]):
+        """Take one token from each rate-limited tool's bucket per use"""
+        now = time.monotonic()
+        for name in tool_names:
+            tool = self.tools.get(name)
+            if tool is not None and tool.rate_limit:
+                tokens = self._refill_bucket(tool, now)
+                self._buckets[name] = (max(tokens - 1.0, 0.0), now)
+
+    def _response_cache_key(self, query: str, use_memory: bool = True) -> str:
+        """Hash the query together with the current tool set and, if it reads memory, the memory state"""
+        memory_state = self._memory_version if use_memory else "stateless"
+        material = f"{query}|{self._tool_set_key}|{memory_state}"
+        return hashlib.blake2b(material.encode(), digest_size=16).hexdigest()
+
+    def _memory_messages(self) -> Tuple[Any, ...]:
+        """Snapshot of the messages currently held in conversation memory"""
+        chat_memory = getattr(self._memory, "chat_memory", None)
+        return tuple(getattr(chat_memory, "messages", ()))
+
+    def _is_cacheable(self, tools_used: List[str]) -> bool:
+        """Answers may be reused only if every tool involved is read-only and deterministic"""
+        return all(self.tools[name].deterministic for name in tools_used if name in self.tools)
+
+    def execute_with_tools(self, query: str, cache_bypass: bool = False) -> str:
+        """Synchronous wrapper around :meth:`aexecute_with_tools`
+
+        Must not be called from a running event loop; async callers should
+        await ``aexecute_with_tools`` directly.
+        """
+        return _run_sync(self.aexecute_with_tools(query, cache_bypass=cache_bypass))
+
+    def run_batch(self, queries: Iterable[str], **kwargs) -> List[str]:
+        """Synchronous wrapper around :meth:`run_batch_async`"""
+        return _run_sync(self.run_batch_async(queries, **kwargs))
+
+    async def run_batch_async(
+        self,
+        queries: Iterable[str],
+        max_concurrency: int = 10,
+        batch_size: Optional[int] = None,
+        delay_between_batches: float = 0.0
+    ) -> List[str]:
+        """Execute independent queries concurrently, returning outputs in input order
+
+        At most ``max_concurrency`` queries run at once. With ``batch_size``
+        set, queries are processed in chunks of that size with
+        ``delay_between_batches`` seconds between chunks, to stay under
+        provider request-per-minute limits.
+        """
+        queries = list(queries)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_one(query: str) -> str:
+            async with semaphore:
+                # Batched queries are independent; sharing the conversation buffer would interleave them
+                return await self.aexecute_with_tools(query, use_memory=False)
+
+        size = batch_size or max(len(queries), 1)
+        results: List[str] = []
+        for start in range(0, len(queries), size):
+            if start and delay_between_batches > 0:
+                await asyncio.sleep(delay_between_batches)
+            results.extend(await asyncio.gather(*(run_one(query) for query in queries[start:start + size])))
+        return results
+
+    async def aexecute_with_tools(self, query: str, cache_bypass: bool = False, use_memory: bool = True) -> str:
+        """Execute query using available tools
+
+        Identical queries against the same tool set and conversation memory
+        are answered from an exact-match cache (entries expire after
+        ``response_cache_ttl`` seconds) unless ``cache_bypass`` is set. Only
+        runs whose tools are all deterministic and read-only are cached, so
+        side-effecting or time-varying calls (file writes, web search) always
+        run again. A memory-backed agent run that adds the exchange to
+        conversation memory is not stored either: the memory state it was keyed
+        on is gone once it finishes. In practice the cache therefore serves
+        stateless, direct and JIT-planned runs. With ``use_memory`` off the
+        query runs without reading or writing conversation memory.
+        """
         try:
-            # Check cost constraints
-            if self.current_session_cost >= self.max_cost_per_session:
-                return "Session cost limit reached. Please start a new session."
-
-            if self.agent_executor is None:
-                return "LangChain is not installed; agent features are unavailable. Please install 'langchain' to enable tool execution."
-
-            # Execute with agent
-            result = self.agent_executor.invoke({
-                "input": query,
-                "tool_names": ", ".join(self.tools.keys()),
-                "max_cost": self.max_cost_per_session,
-                "current_cost": self.current_session_cost
-            })
-
-            # Update session cost (simplified calculation)
-            self.current_session_cost += 1.0  # Base cost per execution
+            cache_key = self._response_cache_key(query, use_memory)
+            if not cache_bypass and cache_key in self._response_cache:
+                return self._response_cache[cache_key]
+
+            # Refuse up front rather than spend an LLM round on a tool that will be throttled
+            if self.enable_tool_recommendation:
+                blocked = self._rate_limit_wait(self._matched_tools(query))
+                if blocked is not None:
+                    tool_name, wait = blocked
+                    return f"Rate limit imminent for {tool_name}, retry in {wait:.1f}s"
+
+            # Check cost constraints, counting runs already in flight
+            estimate = self._estimate_run_cost(query)
+            with self._cost_lock:
+                if self.current_session_cost + self._reserved_cost >= self.max_cost_per_session:
+                    return "Session cost limit reached. Please start a new session."
+                self._reserved_cost += estimate
+
+            try:
+                with _usage_callback() as cb:
+                    planned = await self._execute_direct(query)
+                    if planned is None and self.enable_jit_planning:
+                        planned = await self._execute_jit_plan(query)
+                    if planned is not None:
+                        output, tools_used = planned
+                    else:
+                        self._ensure_agent()
+                        executor = self.agent_executor if use_memory else self._stateless_executor
+                        if executor is None:
+                            return "LangChain is not installed; agent features are unavailable. Please install 'langchain' to enable tool execution."
+
+                        inputs = {
+                            "input": query,
+                            "tool_names": self._tool_names_cached,
+                            "max_cost": self.max_cost_per_session,
+                            "current_cost": self.current_session_cost
+                        }
+                        if not use_memory:
+                            inputs["chat_history"] = []
+
+                        # Execute with agent; tool use is observed via callback rather than
+                        # by having the executor retain and return its intermediate steps
+                        recorder = _load_langchain().ToolUseRecorder()
+                        memory_before = self._memory_messages() if use_memory else ()
+                        result = await executor.ainvoke(inputs, config={"callbacks": [recorder]})
+                        output = result["output"]
+                        tools_used = recorder.tools_used
+                        if use_memory:
+                            memory_after = self._memory_messages()
+                            if len(memory_after) != len(memory_before) or any(
+                                after is not before for after, before in zip(memory_after, memory_before)
+                            ):
+                                # Answers keyed on the old memory state can no longer be hit
+                                self._memory_version += 1
+                                cache_key = None
+
+                # Session cost is the LLM spend plus each invoked tool's cost factor
+                cost = cb.total_cost + sum(self.tools[name].cost_factor for name in tools_used if name in self.tools)
+                with self._cost_lock:
+                    self.current_session_cost += cost
+            finally:
+                with self._cost_lock:
+                    self._reserved_cost -= estimate
+            self._consume_rate_tokens(tools_used)
 
             # Record usage
             self.tool_usage_history.append({
-                "timestamp": datetime.now(),
+                "timestamp_ns": time.time_ns(),
                 "query": query,
-                "result": result["output"],
-                "cost": 1.0
+                "result": output[:HISTORY_RESULT_MAX_CHARS],
+                "cost": cost,
+                "total_tokens": cb.total_tokens,
+                "tools_used": tools_used
             })
 
-            return result["output"]
+            if cache_key is not None and self._is_cacheable(tools_used):
+                self._response_cache[cache_key] = output
+            return output
 
         except Exception as e:
             return f"Tool execution failed: {str(e)}"
 
+    def _estimate_run_cost(self, query: str) -> float:
+        """Tool cost a run is expected to add, reserved against the session limit while it runs"""
+        matched = self._matched_tools(query) if self.enable_tool_recommendation else ()
+        if matched:
+            return sum(self.tools[name].cost_factor for name in matched)
+        return max((tool.cost_factor for tool in self.tools.values()), default=0.0)
+
+    async def _execute_direct(self, query: str) -> Optional[Tuple[str, List[str]]]:
+        """Call the single recommended tool directly when it can parse the query itself"""
+        if not self.enable_tool_recommendation:
+            return None
+        recommendations = self.get_tool_recommendations(query)
+        if len(recommendations) != 1:
+            return None
+
+        tool = self.tools[recommendations[0]]
+        parsed = tool.try_direct_parse(query)
+        if parsed is None:
+            return None
+        return str(await tool.ainvoke(parsed)), [tool.name]
+
+    async def _jit_plan(self, query: str) -> Optional[List[List[Dict[str, Any]]]]:
+        """Ask the LLM for a tool-call DAG and return it as dependency layers
+
+        Returns None if the plan is not valid JSON, references unknown tools
+        or ids, gives a tool arguments its schema rejects, or contains a cycle.
+        """
+        # The plan already expresses parallelism, and batch_tools' inner calls would bypass
+        # the per-node accounting in _execute_jit_plan, so it is not offered to the planner
+        plannable = {name: tool for name, tool in self.tools.items() if not isinstance(tool, BatchTool)}
+        tool_descriptions = "\n".join(f"- {name}: {tool.description}" for name, tool in plannable.items())
+        response = await self.llm.ainvoke([
+            ("system", _JIT_PLAN_PROMPT.format(tool_descriptions=tool_descriptions)),
+            ("human", query),
+        ])
+        content = str(getattr(response, "content", response)).strip()
+        if content.startswith("```"):
+            content = content.strip("`").removeprefix("json").strip()
+
+        try:
+            plan = json.loads(content)
+        except ValueError:
+            return None
+        if not isinstance(plan, list) or not plan:
+            return None
+
+        nodes: Dict[str, Dict[str, Any]] = {}
+        for node in plan:
+            if (
+                not isinstance(node, dict)
+                or node.get("tool") not in plannable
+                or not isinstance(node.get("args", {}), dict)
+                or not isinstance(node.get("deps", []), list)
+                or str(node.get("id")) in nodes
+            ):
+                return None
+            schema = getattr(plannable[node["tool"]], "args_schema", None)
+            if schema is not None and hasattr(schema, "model_validate"):
+                try:
+                    schema.model_validate(node.get("args", {}))
+                except ValidationError:
+                    return None
+            nodes[str(node["id"])] = node
+
+        # Topologically layer the DAG; anything left over is a cycle or dangling dep
+        remaining = {node_id: {str(dep) for dep in node.get("deps", [])} for node_id, node in nodes.items()}
+        done: Set[str] = set()
+        layers: List[List[Dict[str, Any]]] = []
+        while remaining:
+            ready = [node_id for node_id, deps in remaining.items() if deps <= done]
+            if not ready:
+                return None
+            layers.append([nodes[node_id] for node_id in ready])
+            done.update(ready)
+            for node_id in ready:
+                del remaining[node_id]
+        return layers
+
+    async def _execute_jit_plan(self, query: str) -> Optional[Tuple[str, List[str]]]:
+        """Run a JIT plan layer by layer
+
+        Returns the joined outputs of the plan's sink calls together with the
+        names of every tool invoked.
+
+        Returns None when no valid plan could be produced, a planned tool is
+        gone by the time the plan runs, or resolved arguments fail a tool's
+        schema, so the caller can fall back to the ReAct executor.
+        """
+        try:
+            layers = await self._jit_plan(query)
+        except Exception:
+            return None
+        if layers is None:
+            return None
+        # Resolved up front: tools may have been removed while the planner was running
+        tools = {node["tool"]: self.tools.get(node["tool"]) for layer in layers for node in layer}
+        if None in tools.values():
+            return None
+
+        outputs: Dict[str, str] = {}
+
+        def resolve(value: Any) -> Any:
+            if isinstance(value, str):
+                # Longest ids first so "$1" never clobbers part of "$10"
+                for node_id in sorted(outputs, key=len, reverse=True):
+                    value = value.replace(f"${node_id}", outputs[node_id])
+            return value
+
+        for layer in layers:
+            try:
+                results = await asyncio.gather(*(
+                    tools[node["tool"]].ainvoke({k: resolve(v) for k, v in node.get("args", {}).items()})
+                    for node in layer
+                ))
+            except ValidationError:
+                return None
+            outputs.update((str(node["id"]), str(result)) for node, result in zip(layer, results))
+
+        consumed = {str(dep) for layer in layers for node in layer for dep in node.get("deps", [])}
+        output = "\n".join(output for node_id, output in outputs.items() if node_id not in consumed)
+        return output, [node["tool"] for layer in layers for node in layer]
+
     def get_tool_metrics(self) -> Dict[str, Any]:
         """Get comprehensive tool metrics"""
-        metrics = {}
-        for tool_name, tool in self.tools.items():
-            metrics[tool_name] = tool.get_metrics().dict()
+        # Derived metrics for every tool in one vectorized pass over the shared table
+        rows = np.fromiter((tool._metrics_row for tool in self.tools.values()), dtype=np.intp, count=len(self.tools))
+        summary = METRICS_TABLE.summarize(rows)
+        metrics = {
+            tool_name: ToolMetricsTable.to_metrics(tool_name, summary, i).dict()
+            for i, tool_name in enumerate(self.tools)
+        }
 
         return {
             "individual_tools": metrics,
@@ -232,11 +752,24 @@ class AdvancedToolAgent:
             "usage_history_count": len(self.tool_usage_history)
         }
 
+    def export_usage_history(self) -> List[Dict[str, Any]]:
+        """Export usage history with ISO-8601 UTC timestamps"""
+        return [
+            {
+                "timestamp": datetime.fromtimestamp(entry["timestamp_ns"] / 1e9, tz=timezone.utc).isoformat(),
+                **{key: value for key, value in entry.items() if key != "timestamp_ns"}
+            }
+            for entry in self.tool_usage_history
+        ]
+
     def reset_session(self):
         """Reset session metrics and history"""
         self.current_session_cost = 0.0
-        self.tool_usage_history = []
-        self.memory.clear()
+        self.tool_usage_history.clear()
+        self._response_cache.clear()
+        if self._memory is not None:
+            self._memory.clear()
+            self._memory_version += 1
 
         # Reset tool metrics
         for tool in self.tools.values():
@@ -262,3 +795,33 @@ class AdvancedToolAgent:
             },
             "metrics": self.get_tool_metrics()
         }
+
+    def export_tool_configuration_bytes(self) -> bytes:
+        """Export the tool configuration pre-serialized as JSON
+
+        Suitable for returning directly as a response body. The payload is
+        re-serialized only when something it reports changes (tool set or tool
+        settings, agent configuration, session cost, history length or any
+        tool's metrics), so repeated polling is cheap.
+        """
+        key = (
+            self._tools_version,
+            self.current_session_cost,
+            self.max_cost_per_session,
+            self.enable_tool_recommendation,
+            len(self.tool_usage_history),
+            tuple(
+                (tool.metrics_version, tool.description, tool.cost_factor, tool.rate_limit, tool.version)
+                for tool in self.tools.values()
+            )
+        )
+        if self._export_cache is not None and self._export_cache[0] == key:
+            return self._export_cache[1]
+
+        config = self.export_tool_configuration()
+        if ORJSON_AVAILABLE:
+            payload = orjson.dumps(config, option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY)
+        else:
+            payload = json.dumps(config, default=str).encode()
+        self._export_cache = (key, payload)
+        return payload
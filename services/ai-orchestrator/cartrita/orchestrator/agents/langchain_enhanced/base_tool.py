@@ -1,19 +1,29 @@
-from typing import Any, List, Optional
+import asyncio
+import json
+import threading
+import weakref
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, List, Optional
 from enum import Enum
 from datetime import datetime
 import time
 
+import numpy as np
+
+try:
+    import orjson  # type: ignore
+
+    ORJSON_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency path
+    ORJSON_AVAILABLE = False
+
 # Optional LangChain imports with fallbacks
 try:
     from langchain.tools import BaseTool  # type: ignore
-    from langchain.pydantic_v1 import BaseModel  # type: ignore
     LANGCHAIN_AVAILABLE = True
 except Exception:  # pragma: no cover - optional dependency path
     LANGCHAIN_AVAILABLE = False
-    try:
-        from pydantic.v1 import BaseModel  # type: ignore
-    except Exception:  # pragma: no cover
-        from pydantic import BaseModel  # type: ignore
 
     class BaseTool:  # type: ignore
         name: str
@@ -27,6 +37,22 @@ except Exception:  # pragma: no cover - optional dependency path
             return self._run(*args, **kwargs)
 
 
+# Sliding window, in seconds, that ``rate_limit`` is counted over
+RATE_LIMIT_WINDOW = 60.0
+
+
+def _to_text(result: Any) -> str:
+    """Render a tool result for the LLM: strings as-is, structured data as compact JSON"""
+    if isinstance(result, str):
+        return result
+    try:
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+        return json.dumps(result, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return str(result)
+
+
 class ToolCategory(str, Enum):
     COMPUTATION = "computation"
     DATA_ACCESS = "data_access"
@@ -38,7 +64,10 @@ class ToolCategory(str, Enum):
     SYSTEM = "system"
 
 
-class ToolMetrics(BaseModel):
+@dataclass(frozen=True, slots=True)
+class ToolMetrics:
+    """Read-only metrics snapshot; plain dataclass so building one skips model validation"""
+
     name: str
     total_calls: int = 0
     success_rate: float = 1.0
@@ -46,6 +75,93 @@ class ToolMetrics(BaseModel):
     last_used: Optional[datetime] = None
     error_count: int = 0
 
+    def dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class ToolMetricsTable:
+    """
+    Column-oriented (SoA) raw counters for every tool, one row per tool.
+
+    Per-call updates are a few scalar writes; derived values (success rate,
+    average latency) are computed only on export, vectorized across rows.
+    ``last_used`` holds ``time.perf_counter()`` readings. All reads and writes
+    take the lock, since growth swaps in new arrays and an update landing in the
+    old ones mid-copy would be lost.
+    """
+
+    _COLUMNS = (("calls", np.int64), ("errors", np.int64), ("total_time", np.float64), ("last_used", np.float64))
+
+    def __init__(self, capacity: int = 64):
+        for column, dtype in self._COLUMNS:
+            setattr(self, column, np.zeros(capacity, dtype=dtype))
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        """Reserve a zeroed row, growing the columns if none are free"""
+        with self._lock:
+            if not self._free:
+                capacity = len(self.calls)
+                for column, _ in self._COLUMNS:
+                    setattr(self, column, np.concatenate([getattr(self, column), np.zeros_like(getattr(self, column))]))
+                self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
+            row = self._free.pop()
+        self.clear(row)
+        return row
+
+    def release(self, row: int) -> None:
+        with self._lock:
+            self._free.append(row)
+
+    def clear(self, row: int) -> None:
+        with self._lock:
+            for column, _ in self._COLUMNS:
+                getattr(self, column)[row] = 0
+
+    def record(self, row: int, success: bool, execution_time: float, now: float) -> None:
+        with self._lock:
+            self.calls[row] += 1
+            self.total_time[row] += execution_time
+            self.last_used[row] = now
+            if not success:
+                self.errors[row] += 1
+
+    def summarize(self, rows: Any) -> Dict[str, np.ndarray]:
+        """Raw and derived metric columns for ``rows``, computed in one vectorized pass"""
+        with self._lock:
+            calls = self.calls[rows]
+            errors = self.errors[rows]
+            total_time = self.total_time[rows]
+            last_used = self.last_used[rows]
+        called = calls > 0
+        safe_calls = np.where(called, calls, 1)
+        # Map monotonic readings back onto the wall clock with one pair of clock reads
+        wall_offset = time.time() - time.perf_counter()
+        return {
+            "total_calls": calls,
+            "error_count": errors,
+            "success_rate": np.where(called, (calls - errors) / safe_calls, 1.0),
+            "average_execution_time": np.where(called, total_time / safe_calls, 0.0),
+            "last_used": np.where(called, last_used + wall_offset, np.nan),
+        }
+
+    @staticmethod
+    def to_metrics(name: str, summary: Dict[str, np.ndarray], i: int) -> "ToolMetrics":
+        last_used = summary["last_used"][i]
+        return ToolMetrics(
+            name=name,
+            total_calls=int(summary["total_calls"][i]),
+            success_rate=float(summary["success_rate"][i]),
+            average_execution_time=float(summary["average_execution_time"][i]),
+            last_used=None if np.isnan(last_used) else datetime.fromtimestamp(last_used),
+            error_count=int(summary["error_count"][i]),
+        )
+
+
+# Shared by all tools so an agent can aggregate its tools' metrics in one pass
+METRICS_TABLE = ToolMetricsTable()
+
 
 class AdvancedCartritaTool(BaseTool):
     category: ToolCategory
@@ -54,10 +170,18 @@ class AdvancedCartritaTool(BaseTool):
     dependencies: List[str] = []
     version: str = "1.0"
     author: Optional[str] = None
+    # Upper bound, in seconds, on a single async call; None waits indefinitely
+    timeout_s: Optional[float] = None
+    # Read-only with output fixed by the input, so an answer built on it may be cached
+    deterministic: bool = False
+    # do_execute blocks on I/O, so the default async hook runs it on a worker thread
+    blocking: bool = False
 
-    _metrics = None
+    _metrics_row: int = -1
     _last_call_time: Optional[float] = None
-    _call_history: List[float] = []
+    # No class default: a shared mutable default would be deep-copied per instance; __init__ builds it
+    _call_history: Deque[float]
+    _metrics_version: int = 0
 
     class Config:
         arbitrary_types_allowed = True
@@ -65,90 +189,131 @@ class AdvancedCartritaTool(BaseTool):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        if not hasattr(self, "_metrics") or self._metrics is None:
-            self._metrics = ToolMetrics(name=getattr(self, "name", self.__class__.__name__))
-        self._metrics.name = getattr(self, "name", self.__class__.__name__)
-        self._call_history = []
+        self._metrics_row = METRICS_TABLE.allocate()
+        weakref.finalize(self, METRICS_TABLE.release, self._metrics_row)
+        self._call_history = self._new_call_history()
 
     def do_execute(self, *args, **kwargs) -> Any:  # pragma: no cover - abstract hook
         raise NotImplementedError
 
+    async def do_aexecute(self, *args, **kwargs) -> Any:
+        """Async execution hook; defaults to ``do_execute``, off the event loop if ``blocking``"""
+        if self.blocking:
+            return await asyncio.to_thread(self.do_execute, *args, **kwargs)
+        return self.do_execute(*args, **kwargs)
+
+    def try_direct_parse(self, query: str) -> Optional[dict]:
+        """Return tool input if ``query`` is an unambiguous direct invocation, else None"""
+        return None
+
     def _run(self, *args, run_manager: Optional[Any] = None, **kwargs: Any) -> str:
-        if not self._check_rate_limit():
+        start_time = time.perf_counter()
+        if not self._check_rate_limit(start_time):
             return f"Rate limit exceeded for tool {self.name}. Please wait."
-
-        start_time = time.time()
-        self._last_call_time = start_time
-        self._call_history.append(start_time)
-        cutoff_time = start_time - 3600
-        self._call_history = [t for t in self._call_history if t > cutoff_time]
+        self._record_call(start_time)
+        # Progress text is only worth emitting when some handler will receive it
+        if run_manager is not None and not run_manager.handlers:
+            run_manager = None
 
         try:
             if run_manager:
                 run_manager.on_text(f"Executing {self.name}...\n", color="blue")
             result = self.do_execute(*args, **kwargs)
-            exec_time = time.time() - start_time
-            self._update_metrics(True, exec_time)
+            end_time = time.perf_counter()
+            exec_time = end_time - start_time
+            self._update_metrics(True, exec_time, now=end_time)
             if run_manager:
                 run_manager.on_text(f"Completed in {exec_time:.2f}s\n", color="green")
-            return str(result)
+            return _to_text(result)
         except Exception as e:  # pragma: no cover - runtime path
-            exec_time = time.time() - start_time
-            self._update_metrics(False, exec_time, str(e))
+            end_time = time.perf_counter()
+            exec_time = end_time - start_time
+            error = str(e)
+            self._update_metrics(False, exec_time, error, now=end_time)
             if run_manager:
-                run_manager.on_text(f"Error: {str(e)}\n", color="red")
-            return f"Tool execution failed: {str(e)}"
+                run_manager.on_text(f"Error: {error}\n", color="red")
+            return f"Tool execution failed: {error}"
 
     async def _arun(self, *args, run_manager: Optional[Any] = None, **kwargs: Any) -> str:
-        if not self._check_rate_limit():
+        start_time = time.perf_counter()
+        if not self._check_rate_limit(start_time):
             return f"Rate limit exceeded for tool {self.name}. Please wait."
-
-        start_time = time.time()
-        self._last_call_time = start_time
-        self._call_history.append(start_time)
-        cutoff_time = start_time - 3600
-        self._call_history = [t for t in self._call_history if t > cutoff_time]
+        self._record_call(start_time)
+        # Each on_text is an await; skip them when no handler will receive the text
+        if run_manager is not None and not run_manager.handlers:
+            run_manager = None
 
         try:
             if run_manager:
                 await run_manager.on_text(f"Executing {self.name}...\n", color="blue")
-            result = self.do_execute(*args, **kwargs)
-            exec_time = time.time() - start_time
-            self._update_metrics(True, exec_time)
+            if self.timeout_s:
+                result = await asyncio.wait_for(self.do_aexecute(*args, **kwargs), timeout=self.timeout_s)
+            else:
+                result = await self.do_aexecute(*args, **kwargs)
+            end_time = time.perf_counter()
+            exec_time = end_time - start_time
+            self._update_metrics(True, exec_time, now=end_time)
             if run_manager:
                 await run_manager.on_text(f"Completed in {exec_time:.2f}s\n", color="green")
-            return str(result)
+            return _to_text(result)
+        except asyncio.TimeoutError:
+            end_time = time.perf_counter()
+            self._update_metrics(False, end_time - start_time, "timeout", now=end_time)
+            if run_manager:
+                await run_manager.on_text(f"Timed out after {self.timeout_s:.2f}s\n", color="red")
+            return f"Tool execution timed out: {self.name} exceeded {self.timeout_s:.2f}s"
         except Exception as e:  # pragma: no cover
-            exec_time = time.time() - start_time
-            self._update_metrics(False, exec_time, str(e))
+            end_time = time.perf_counter()
+            exec_time = end_time - start_time
+            error = str(e)
+            self._update_metrics(False, exec_time, error, now=end_time)
             if run_manager:
-                await run_manager.on_text(f"Error: {str(e)}\n", color="red")
-            return f"Tool execution failed: {str(e)}"
+                await run_manager.on_text(f"Error: {error}\n", color="red")
+            return f"Tool execution failed: {error}"
 
     def _execute(self, *args, **kwargs) -> Any:
         return self.do_execute(*args, **kwargs)
 
-    def _check_rate_limit(self) -> bool:
+    def _new_call_history(self) -> Deque[float]:
+        # Only the last rate_limit calls decide admission, so older ones fall off the left
+        return deque(maxlen=self.rate_limit or None)
+
+    def _record_call(self, now: float) -> None:
+        self._last_call_time = now
+        # The history only feeds the rate limiter; unlimited tools skip the bookkeeping
+        if self.rate_limit:
+            if self._call_history.maxlen != self.rate_limit:
+                self._call_history = deque(self._call_history, maxlen=self.rate_limit)
+            self._call_history.append(now)
+
+    def _check_rate_limit(self, now: Optional[float] = None) -> bool:
         if not self.rate_limit:
             return True
-        now = time.time()
-        recent = [t for t in self._call_history if t > now - 60]
-        return len(recent) < self.rate_limit
-
-    def _update_metrics(self, success: bool, execution_time: float, error: Optional[str] = None) -> None:
-        self._metrics.total_calls += 1
-        self._metrics.last_used = datetime.now()
-        if not success:
-            self._metrics.error_count += 1
-        self._metrics.success_rate = (
-            (self._metrics.total_calls - self._metrics.error_count) / self._metrics.total_calls
+        history = self._call_history
+        if len(history) < self.rate_limit:
+            return True
+        # Full window: admit once the oldest of the last rate_limit calls has aged out
+        cutoff = (time.perf_counter() if now is None else now) - RATE_LIMIT_WINDOW
+        return history[-self.rate_limit] <= cutoff
+
+    def _update_metrics(
+        self, success: bool, execution_time: float, error: Optional[str] = None, now: Optional[float] = None
+    ) -> None:
+        METRICS_TABLE.record(
+            self._metrics_row, success, execution_time, time.perf_counter() if now is None else now
         )
-        total_time = self._metrics.average_execution_time * (self._metrics.total_calls - 1)
-        self._metrics.average_execution_time = (total_time + execution_time) / self._metrics.total_calls
+        self._metrics_version += 1
 
     def get_metrics(self) -> ToolMetrics:
-        return self._metrics.copy()
+        summary = METRICS_TABLE.summarize([self._metrics_row])
+        return ToolMetricsTable.to_metrics(self.name, summary, 0)
+
+    @property
+    def metrics_version(self) -> int:
+        """Counter bumped whenever the metrics change, for cheap staleness checks"""
+        return self._metrics_version
 
     def reset_metrics(self) -> None:
-        self._metrics = ToolMetrics(name=getattr(self, "name", self.__class__.__name__))
-        self._call_history = []
+        self._metrics_version += 1
+        METRICS_TABLE.clear(self._metrics_row)
+        self._call_history = self._new_call_history()
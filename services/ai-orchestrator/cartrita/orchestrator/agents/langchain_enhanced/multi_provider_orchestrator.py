@@ -4,16 +4,104 @@ Leverages both OpenAI and Hugging Face APIs for optimal performance and cost
 """
 
 import asyncio
+import contextlib
+import hashlib
 import os
-from typing import Any, Dict, List, Optional
+import statistics
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
 from enum import Enum
 from datetime import datetime
 from dataclasses import dataclass, field
+from functools import lru_cache
 
+import httpx
+from cachetools import LRUCache, TTLCache
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
-from langchain.memory import ConversationSummaryBufferMemory
+from langchain.memory import ConversationBufferMemory, ConversationSummaryBufferMemory
 import tiktoken
 
+from cartrita.orchestrator.utils.semantic_cache import SemanticQueryCache
+
+try:
+    import h2  # type: ignore  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Seconds an exact-match response stays reusable
+RESPONSE_CACHE_TTL = float(os.getenv("CARTRITA_MPO_RESPONSE_CACHE_TTL", "3600"))
+# Opt-in paraphrase cache; every standalone query then costs one embedding call
+SEMANTIC_CACHE_ENABLED = os.getenv("CARTRITA_MPO_SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("CARTRITA_MPO_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# Connection pool shared by the OpenAI models
+HTTP_MAX_CONNECTIONS = int(os.getenv("CARTRITA_MPO_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("CARTRITA_MPO_HTTP_MAX_KEEPALIVE", "20"))
+# Recent calls kept per model for performance metrics and the selection history bonus
+PERFORMANCE_WINDOW = 100
+# Conversation memory budget; the oldest messages are dropped past it
+MEMORY_TOKEN_LIMIT = int(os.getenv("CARTRITA_MPO_MEMORY_TOKEN_LIMIT", "3500"))
+# Hedged requests: for tasks whose max_latency is at most HEDGE_MAX_LATENCY seconds, the
+# fallback model is raced against a primary that hasn't answered within its median latency
+# plus HEDGE_MARGIN (HEDGE_DELAY before any history exists)
+HEDGE_MAX_LATENCY = float(os.getenv("CARTRITA_MPO_HEDGE_MAX_LATENCY", "10"))
+HEDGE_DELAY = float(os.getenv("CARTRITA_MPO_HEDGE_DELAY", "1.5"))
+HEDGE_MARGIN = float(os.getenv("CARTRITA_MPO_HEDGE_MARGIN", "0.25"))
+# Typical English chars-per-token, used when no tokenizer is available
+_AVG_CHARS_PER_TOKEN = 4
+
+
+# Background loop behind the synchronous chat(); kept for the life of the process so
+# that loop's connection pool and in-flight coalescing carry over between calls. Async
+# callers never touch it: their calls use pools bound to their own loop
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_loop_lock = threading.Lock()
+
+
+def _run_sync(coro: Any) -> Any:
+    """Run ``coro`` to completion on the shared background loop and return its result"""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="multi-provider-orchestrator-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
+
+
+@lru_cache(maxsize=1)
+def _token_encoder() -> Optional[tiktoken.Encoding]:
+    """The cl100k_base encoding, loaded once; None if it cannot be loaded"""
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+# Token counts keyed by a digest of the text, so large prompts aren't held in memory as keys
+_token_counts: LRUCache = LRUCache(maxsize=4096)
+_token_counts_lock = threading.Lock()
+
+
+def _count_tokens(text: str) -> int:
+    """Token count of ``text``; memoized so the repeated memory tail isn't re-encoded"""
+    key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    with _token_counts_lock:
+        count = _token_counts.get(key)
+    if count is not None:
+        return count
+    encoding = _token_encoder()
+    if encoding is None:
+        count = len(text) // _AVG_CHARS_PER_TOKEN
+    else:
+        count = len(encoding.encode(text, disallowed_special=()))
+    with _token_counts_lock:
+        _token_counts[key] = count
+    return count
+
 
 class ModelProvider(str, Enum):
     """AI model providers"""
@@ -22,6 +110,22 @@ class ModelProvider(str, Enum):
     LOCAL = "local"
 
 
+# Per-provider cap on in-flight requests and request budget per minute, so bursts wait
+# briefly here instead of drawing 429s and falling back
+PROVIDER_CONCURRENCY = {
+    ModelProvider.OPENAI: int(os.getenv("CARTRITA_MPO_OPENAI_CONCURRENCY", "20")),
+    ModelProvider.HUGGINGFACE: int(os.getenv("CARTRITA_MPO_HF_CONCURRENCY", "8")),
+}
+PROVIDER_REQUESTS_PER_MINUTE = {
+    ModelProvider.OPENAI: float(os.getenv("CARTRITA_MPO_OPENAI_RPM", "500")),
+    ModelProvider.HUGGINGFACE: float(os.getenv("CARTRITA_MPO_HF_RPM", "60")),
+}
+
+
+class HedgedRequestError(RuntimeError):
+    """Both the primary and the hedged fallback call failed"""
+
+
 class TaskComplexity(str, Enum):
     """Task complexity levels"""
     SIMPLE = "simple"
@@ -43,6 +147,29 @@ class ModelConfig:
     quality_score: float = 1.0  # 0-1 scale
 
 
+class PerformanceRecord(NamedTuple):
+    """One model call, as kept in the per-model performance window"""
+    timestamp_ns: int  # time.monotonic_ns() when recorded
+    execution_time: float
+    cost: float
+    success: bool
+
+
+@dataclass
+class PerformanceTotals:
+    """Running sums over a model's performance window, kept in step with its records"""
+    calls: int = 0
+    successes: int = 0
+    total_time: float = 0.0
+    total_cost: float = 0.0
+
+    def add(self, record: PerformanceRecord, sign: int = 1):
+        self.calls += sign
+        self.successes += sign * record.success
+        self.total_time += sign * record.execution_time
+        self.total_cost += sign * record.cost
+
+
 @dataclass
 class TaskRequirements:
     """Requirements for a specific task"""
@@ -55,6 +182,33 @@ class TaskRequirements:
     domain_expertise: List[str] = field(default_factory=list)
 
 
+# Quality a model needs to be a good fit for each task complexity
+COMPLEXITY_QUALITY = {
+    TaskComplexity.SIMPLE: 0.7,
+    TaskComplexity.MEDIUM: 0.8,
+    TaskComplexity.COMPLEX: 0.9,
+    TaskComplexity.CRITICAL: 1.0
+}
+
+
+class TokenBudgetMemory(ConversationBufferMemory):
+    """Conversation buffer that drops its oldest messages once over ``max_token_limit`` tokens"""
+
+    max_token_limit: int = MEMORY_TOKEN_LIMIT
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+        messages = self.chat_memory.messages
+        # Per-message counts are memoized, so only the new exchange is actually encoded
+        total = sum(_count_tokens(str(m.content)) for m in messages)
+        drop = 0
+        while total > self.max_token_limit and drop < len(messages):
+            total -= _count_tokens(str(messages[drop].content))
+            drop += 1
+        if drop:
+            del messages[:drop]
+
+
 class MultiProviderOrchestrator:
     """
     Advanced AI orchestrator that intelligently selects between OpenAI and Hugging Face models
@@ -77,19 +231,64 @@ class MultiProviderOrchestrator:
         self.cost_optimization = cost_optimization
         self.fallback_strategy = fallback_strategy
         self.session_cost_limit = kwargs.get("session_cost_limit", 50.0)
+        self.hedge_max_latency = kwargs.get("hedge_max_latency", HEDGE_MAX_LATENCY)
         self.current_session_cost = 0.0
+        # Sampling temperature for every model; responses are only cached when it is 0
+        self.temperature = kwargs.get("temperature", 0.7)
+
+        # Exact-match cache of responses keyed by model + the full prompt (memory included),
+        # so entries stay valid across session resets
+        self._response_cache: TTLCache = TTLCache(
+            maxsize=kwargs.get("response_cache_size", 1024),
+            ttl=kwargs.get("response_cache_ttl", RESPONSE_CACHE_TTL)
+        )
+        # Paraphrase cache of deterministic answers; entries are keyed by the rest of the prompt
+        # (model, context, memory) so one conversation's answer can't leak into another
+        self.semantic_cache = SemanticQueryCache(
+            threshold=kwargs.get("semantic_cache_threshold", SEMANTIC_CACHE_THRESHOLD),
+            ttl=self._response_cache.ttl
+        )
+        self._query_embedder = kwargs.get("query_embedder")
+        # Deterministic prompts currently being answered; identical concurrent requests
+        # await the same call instead of issuing their own
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # Provider throttling: token buckets of (tokens, last refill) shared by every caller,
+        # and concurrency semaphores per event loop (a semaphore is bound to one loop)
+        self._buckets: Dict[ModelProvider, Tuple[float, float]] = {}
+        self._bucket_lock = threading.Lock()
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[ModelProvider, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        if self._query_embedder is None and kwargs.get("semantic_cache", SEMANTIC_CACHE_ENABLED) and self.openai_api_key:
+            try:
+                from langchain_openai import OpenAIEmbeddings
+                self._query_embedder = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
+            except ImportError:
+                self._query_embedder = None
 
         # Model configurations
         self.available_models = self._initialize_model_configs()
         self.model_instances: Dict[str, Any] = {}
 
         # Performance tracking
-        self.model_performance: Dict[str, Dict[str, float]] = {}
+        self.model_performance: Dict[str, Deque[PerformanceRecord]] = {}
+        self._performance_totals: Dict[str, PerformanceTotals] = {}
         self.usage_history: List[Dict[str, Any]] = []
 
-        # Initialize basic LLM for memory if keys available
+        # Every OpenAI model talks to the same host, so they share one connection pool
+        # (HTTP/2 multiplexed when h2 is installed) instead of one per model. A pool is bound
+        # to the loop that first uses it, so each event loop gets its own pool and model
+        # instances, built from the per-model kwargs kept here
+        self._pooled_model_kwargs: Dict[str, Dict[str, Any]] = {}
+        self._loop_models: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, Dict[str, Any]]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        # Summarizing overflow costs an extra (blocking) LLM call per long turn, so by default
+        # memory is a token-budgeted window instead
         basic_llm = None
-        if self.openai_api_key:
+        if kwargs.get("summarize_memory", False) and self.openai_api_key:
             try:
                 from cartrita.orchestrator.utils.llm_factory import create_chat_openai
                 basic_llm = create_chat_openai(api_key=self.openai_api_key, model="gpt-3.5-turbo")
@@ -105,15 +304,18 @@ class MultiProviderOrchestrator:
                 max_token_limit=4000
             )
         else:
-            from langchain.memory import ConversationBufferMemory
-            self.memory = ConversationBufferMemory(
+            self.memory = TokenBudgetMemory(
                 memory_key="chat_history",
-                return_messages=True
+                return_messages=True,
+                max_token_limit=kwargs.get("memory_token_limit", MEMORY_TOKEN_LIMIT)
             )
 
         # Initialize model instances
         self._initialize_models()
 
+        # Load the tokenizer off the request path; the first estimate then finds it ready
+        threading.Thread(target=_token_encoder, name="tiktoken-prewarm", daemon=True).start()
+
     def _initialize_model_configs(self) -> Dict[str, ModelConfig]:
         """Initialize available model configurations"""
         configs = {}
@@ -196,13 +398,16 @@ class MultiProviderOrchestrator:
             try:
                 if config.provider == ModelProvider.OPENAI:
                     from cartrita.orchestrator.utils.llm_factory import create_chat_openai
-                    self.model_instances[model_id] = create_chat_openai(
+                    model_kwargs = dict(
                         model=config.name,
                         api_key=self.openai_api_key,
-                        temperature=0.7,
+                        temperature=self.temperature,
                         max_tokens=2048,
                         streaming=config.supports_streaming
                     )
+                    # Used outside any event loop; async calls go through _model_instance
+                    self.model_instances[model_id] = create_chat_openai(**model_kwargs)
+                    self._pooled_model_kwargs[model_id] = model_kwargs
 
                 elif config.provider == ModelProvider.HUGGINGFACE:
                     # Use Hugging Face Inference API
@@ -214,7 +419,7 @@ class MultiProviderOrchestrator:
                         repo_id=config.name,
                         huggingfacehub_api_token=self.huggingface_api_key,
                         max_new_tokens=1024,
-                        temperature=0.7,
+                        temperature=self.temperature,
                         timeout=60,
                         streaming=config.supports_streaming
                     )
@@ -229,6 +434,60 @@ class MultiProviderOrchestrator:
                 print(f"Failed to initialize model {model_id}: {e}")
                 continue
 
+        self._refresh_model_index()
+
+    def add_model(self, model_id: str, config: ModelConfig, instance: Any):
+        """Register a model configuration together with its initialized instance"""
+        self.available_models[model_id] = config
+        self.model_instances[model_id] = instance
+        self._pooled_model_kwargs.pop(model_id, None)
+        for _, models in self._loop_models.values():
+            models.pop(model_id, None)
+        self._refresh_model_index()
+
+    def _model_instance(self, model_id: str) -> Any:
+        """The instance of ``model_id`` to call from the running loop, on that loop's connection pool"""
+        model_kwargs = self._pooled_model_kwargs.get(model_id)
+        if model_kwargs is None:
+            return self.model_instances[model_id]
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.model_instances[model_id]
+        entry = self._loop_models.get(loop)
+        if entry is None:
+            entry = self._loop_models[loop] = (
+                httpx.AsyncClient(
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+                ),
+                {}
+            )
+        client, models = entry
+        model = models.get(model_id)
+        if model is None:
+            from cartrita.orchestrator.utils.llm_factory import create_chat_openai
+            model = models[model_id] = create_chat_openai(**model_kwargs, http_async_client=client)
+        return model
+
+    def _refresh_model_index(self):
+        """Precompute the selectable models for each capability combination"""
+        ready = [
+            (model_id, config, frozenset(config.expertise_areas))
+            for model_id, config in self.available_models.items()
+            if model_id in self.model_instances
+        ]
+        # Keyed by (requires_function_calling, requires_streaming)
+        self._candidates_by_capability: Dict[Tuple[bool, bool], Tuple[Tuple[str, ModelConfig, FrozenSet[str]], ...]] = {
+            (function_calling, streaming): tuple(
+                entry for entry in ready
+                if (entry[1].supports_function_calling or not function_calling)
+                and (entry[1].supports_streaming or not streaming)
+            )
+            for function_calling in (False, True)
+            for streaming in (False, True)
+        }
+
     def select_optimal_model(
         self,
         task_requirements: TaskRequirements,
@@ -238,19 +497,13 @@ class MultiProviderOrchestrator:
         Select the optimal model based on task requirements and constraints
         """
         candidates = []
+        # Initialized models that already meet the capability requirements
+        capable = self._candidates_by_capability[
+            (bool(task_requirements.requires_function_calling), bool(task_requirements.requires_streaming))
+        ]
+        wanted_expertise = frozenset(task_requirements.domain_expertise)
 
-        for model_id, config in self.available_models.items():
-            # Skip if model not initialized
-            if model_id not in self.model_instances:
-                continue
-
-            # Check hard requirements
-            if task_requirements.requires_function_calling and not config.supports_function_calling:
-                continue
-
-            if task_requirements.requires_streaming and not config.supports_streaming:
-                continue
-
+        for model_id, config, expertise in capable:
             # Check context length
             if context_length and context_length > config.max_tokens:
                 continue
@@ -269,13 +522,12 @@ class MultiProviderOrchestrator:
 
             # Check domain expertise
             expertise_match = 0.0
-            if task_requirements.domain_expertise:
-                matches = set(config.expertise_areas) & set(task_requirements.domain_expertise)
-                expertise_match = len(matches) / len(task_requirements.domain_expertise)
+            if wanted_expertise:
+                expertise_match = len(expertise & wanted_expertise) / len(task_requirements.domain_expertise)
 
             # Calculate suitability score
             suitability = self._calculate_suitability_score(
-                config, task_requirements, estimated_cost, expertise_match
+                config, task_requirements, estimated_cost, expertise_match, model_id
             )
 
             candidates.append({
@@ -308,7 +560,8 @@ class MultiProviderOrchestrator:
         config: ModelConfig,
         requirements: TaskRequirements,
         estimated_cost: float,
-        expertise_match: float
+        expertise_match: float,
+        model_id: Optional[str] = None
     ) -> float:
         """Calculate model suitability score"""
 
@@ -323,30 +576,104 @@ class MultiProviderOrchestrator:
         score -= cost_penalty
 
         # Complexity matching
-        complexity_scores = {
-            TaskComplexity.SIMPLE: 0.7,
-            TaskComplexity.MEDIUM: 0.8,
-            TaskComplexity.COMPLEX: 0.9,
-            TaskComplexity.CRITICAL: 1.0
-        }
-
-        required_quality = complexity_scores[requirements.complexity]
-        if config.quality_score >= required_quality:
+        if config.quality_score >= COMPLEXITY_QUALITY[requirements.complexity]:
             score += 0.1  # Bonus for meeting complexity requirements
         else:
             score -= 0.2  # Penalty for not meeting complexity
 
-        # Historical performance bonus
-        if config.name in self.model_performance:
-            avg_performance = sum(self.model_performance[config.name].values()) / len(self.model_performance[config.name])
-            score += (avg_performance - 0.5) * 0.1
+        # Historical performance bonus; performance is recorded per model id
+        totals = self._performance_totals.get(model_id or config.name)
+        if totals and totals.calls:
+            score += (totals.successes / totals.calls - 0.5) * 0.1
 
         return max(0.0, min(1.0, score))
 
-    async def _invoke_model(self, model: Any, messages: List[BaseMessage], callbacks: Optional[Any]) -> Any:
-        if hasattr(model, 'ainvoke'):
-            return await model.ainvoke(messages, callbacks=callbacks)
-        return model.invoke(messages, callbacks=callbacks)
+    def _provider_semaphore(self, provider: ModelProvider) -> Any:
+        limit = PROVIDER_CONCURRENCY.get(provider)
+        if not limit:
+            return contextlib.nullcontext()
+        per_loop = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if provider not in per_loop:
+            per_loop[provider] = asyncio.Semaphore(limit)
+        return per_loop[provider]
+
+    async def _acquire_provider_token(self, provider: ModelProvider):
+        """Wait until the provider's bucket (a minute's worth of requests) has one to spend"""
+        rate = PROVIDER_REQUESTS_PER_MINUTE.get(provider)
+        if not rate:
+            return
+        while True:
+            with self._bucket_lock:
+                now = time.monotonic()
+                tokens, last_refill = self._buckets.get(provider, (rate, now))
+                tokens = min(rate, tokens + (now - last_refill) * rate / 60.0)
+                if tokens >= 1.0:
+                    self._buckets[provider] = (tokens - 1.0, now)
+                    return
+                self._buckets[provider] = (tokens, now)
+                wait = (1.0 - tokens) * 60.0 / rate
+            await asyncio.sleep(wait)
+
+    async def _invoke_model(
+        self, model: Any, messages: List[BaseMessage], callbacks: Optional[Any], provider: Optional[ModelProvider] = None
+    ) -> Any:
+        async with self._provider_semaphore(provider):
+            await self._acquire_provider_token(provider)
+            if hasattr(model, 'ainvoke'):
+                return await model.ainvoke(messages, callbacks=callbacks)
+            return model.invoke(messages, callbacks=callbacks)
+
+    def _hedge_delay(self, model_id: str, max_latency: float) -> float:
+        """Seconds to give ``model_id`` before racing the fallback: its median success latency plus a margin"""
+        latencies = [r.execution_time for r in self.model_performance.get(model_id, ()) if r.success]
+        delay = statistics.median(latencies) + HEDGE_MARGIN if latencies else HEDGE_DELAY
+        return min(delay, max_latency)
+
+    async def _invoke_hedged(
+        self,
+        model_id: str,
+        messages: List[BaseMessage],
+        callbacks: Optional[Any],
+        task_requirements: TaskRequirements
+    ) -> Tuple[str, Any]:
+        """Invoke ``model_id``, racing the fallback model against it once it runs slow.
+
+        Returns the id of the model that answered and its response. Hedging only
+        applies to latency-sensitive tasks, since the loser's call is still paid for.
+        """
+        config = self.available_models[model_id]
+        backup_id = self._get_fallback_model() if self.fallback_strategy else None
+        if (
+            backup_id is None
+            or backup_id == model_id
+            or task_requirements.max_latency > self.hedge_max_latency
+        ):
+            return model_id, await self._invoke_model(self._model_instance(model_id), messages, callbacks, config.provider)
+
+        primary = asyncio.ensure_future(
+            self._invoke_model(self._model_instance(model_id), messages, callbacks, config.provider)
+        )
+        racers = {primary: model_id}
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self._hedge_delay(model_id, task_requirements.max_latency))
+            if done:
+                return model_id, primary.result()
+
+            backup = asyncio.ensure_future(self._invoke_model(
+                self._model_instance(backup_id), messages, callbacks, self.available_models[backup_id].provider
+            ))
+            racers[backup] = backup_id
+            pending.add(backup)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return racers[task], task.result()
+            raise HedgedRequestError(str(primary.exception())) from primary.exception()
+        finally:
+            for task in pending:
+                task.cancel()
 
     def _compute_cost(self, config: ModelConfig, response_text: str) -> float:
         estimated_tokens = self._estimate_response_tokens(response_text)
@@ -358,6 +685,39 @@ class MultiProviderOrchestrator:
         self._record_performance(model_id, execution_time, cost, True)
         return execution_time
 
+    @staticmethod
+    def _prompt_digest(model_id: str, messages: List[BaseMessage]) -> str:
+        """Hash of the model and ``messages``"""
+        material = "\x1e".join([model_id, *(f"{m.type}\x1f{m.content}" for m in messages)])
+        return hashlib.blake2b(material.encode(), digest_size=16).hexdigest()
+
+    def _response_cache_key(self, model_id: str, messages: List[BaseMessage]) -> Optional[str]:
+        """Hash of the model and every prompt message, or None when sampling makes responses vary"""
+        if self.temperature:
+            return None
+        return self._prompt_digest(model_id, messages)
+
+    async def _embed_query(self, query: str) -> Optional[Any]:
+        """Normalized query embedding for the semantic cache; None skips the cache"""
+        try:
+            return SemanticQueryCache.normalize(await self._query_embedder.aembed_query(query))
+        except Exception:
+            # The cache is only an optimization; a failed embedding just bypasses it
+            return None
+
+    def _cached_result(self, model_id: str, query: str, response_text: str, start_time: datetime) -> Dict[str, Any]:
+        self._update_memory(query, response_text)
+        return {
+            "success": True,
+            "response": response_text,
+            "selected_model": model_id,
+            "provider": self.available_models[model_id].provider.value,
+            "execution_time": (datetime.now() - start_time).total_seconds(),
+            "cost": 0.0,
+            "session_total_cost": self.current_session_cost,
+            "cached": True
+        }
+
     def _update_memory(self, query: str, response_text: str):
         self.memory.save_context({"input": query}, {"output": response_text})
 
@@ -373,11 +733,11 @@ class MultiProviderOrchestrator:
         if not (fallback_model and fallback_model in self.model_instances):
             return None
         try:
-            model = self.model_instances[fallback_model]
+            model = self._model_instance(fallback_model)
+            cfg = self.available_models[fallback_model]
             messages = self._prepare_messages(query, context)
-            response = await self._invoke_model(model, messages, callbacks=None)
+            response = await self._invoke_model(model, messages, callbacks=None, provider=cfg.provider)
 
-            cfg = self.available_models[fallback_model]
             response_text = response.content if hasattr(response, 'content') else str(response)
             cost = self._compute_cost(cfg, response_text)
 
@@ -422,8 +782,9 @@ class MultiProviderOrchestrator:
                 quality_threshold=0.8
             )
 
-        # Estimate context length
-        context_length = self._estimate_token_count(query, context)
+        # Prepared once: the same messages are sized for selection and sent to the model
+        messages = self._prepare_messages(query, context)
+        context_length = self._estimate_token_count(query, context, messages)
 
         # Select optimal model
         selected_model = self.select_optimal_model(task_requirements, context_length)
@@ -443,32 +804,78 @@ class MultiProviderOrchestrator:
                 }
 
         try:
-            model = self.model_instances[selected_model]
             config = self.available_models[selected_model]
-            messages = self._prepare_messages(query, context)
-            response = await self._invoke_model(model, messages, callbacks)
 
-            response_text = response.content if hasattr(response, 'content') else str(response)
+            cache_key = self._response_cache_key(selected_model, messages)
+            cached = self._response_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                return self._cached_result(selected_model, query, cached, start_time)
+            if cache_key in self._inflight:
+                shared = await asyncio.shield(self._inflight[cache_key])
+                # None means that call failed; make our own attempt
+                if shared is not None:
+                    return self._cached_result(selected_model, query, shared, start_time)
+
+            # A paraphrase matches only under the same model, context and memory: the whole
+            # prompt except the final user turn. Sampled answers vary, so like the exact cache
+            # this only runs when temperature is 0
+            query_vector = None
+            if self._query_embedder is not None and not self.temperature:
+                semantic_signature = (self._prompt_digest(selected_model, messages[:-1]),)
+                query_vector = await self._embed_query(query)
+                if query_vector is not None:
+                    cached = self.semantic_cache.lookup(query_vector, semantic_signature)
+                    if cached is not None:
+                        return self._cached_result(selected_model, query, cached, start_time)
+
+            inflight = None
+            if cache_key and cache_key not in self._inflight:
+                inflight = self._inflight[cache_key] = asyncio.get_running_loop().create_future()
+            response_text = None
+            try:
+                answered_by, response = await self._invoke_hedged(selected_model, messages, callbacks, task_requirements)
+                response_text = response.content if hasattr(response, 'content') else str(response)
+            finally:
+                if inflight is not None:
+                    del self._inflight[cache_key]
+                    inflight.set_result(response_text)
+
+            hedged = answered_by != selected_model
+            if hedged:
+                config = self.available_models[answered_by]
             cost = self._compute_cost(config, response_text)
-            execution_time = self._record_success(selected_model, start_time, cost)
+            execution_time = self._record_success(answered_by, start_time, cost)
             self._update_memory(query, response_text)
+            # Cache entries are keyed by the selected model, so only its own answers are stored
+            if cache_key and not hedged:
+                self._response_cache[cache_key] = response_text
+            if query_vector is not None and not hedged:
+                self.semantic_cache.add(query_vector, semantic_signature, response_text)
 
-            return {
+            result = {
                 "success": True,
                 "response": response_text,
-                "selected_model": selected_model,
+                "selected_model": answered_by,
                 "provider": config.provider.value,
                 "execution_time": execution_time,
                 "cost": cost,
                 "session_total_cost": self.current_session_cost
             }
+            if hedged:
+                result.update(used_fallback=True, hedged=True)
+            return result
 
         except Exception as e:
             # Record failure
             execution_time = (datetime.now() - start_time).total_seconds()
             self._record_performance(selected_model, execution_time, 0.0, False)
 
-            if self.fallback_strategy and selected_model != self._get_fallback_model():
+            # A hedged request has already tried the fallback
+            if (
+                self.fallback_strategy
+                and not isinstance(e, HedgedRequestError)
+                and selected_model != self._get_fallback_model()
+            ):
                 last_error = str(e)
                 fb = await self._attempt_fallback(query, context, start_time, execution_time, last_error)
                 if fb is not None:
@@ -519,56 +926,46 @@ class MultiProviderOrchestrator:
 
         return messages
 
-    def _estimate_token_count(self, query: str, context: Optional[str] = None) -> int:
-        """Estimate token count for query and context"""
-        try:
-            # Use tiktoken for more accurate estimation
-            encoding = tiktoken.get_encoding("cl100k_base")
-
-            text = query
-            if context:
-                text = f"{context}\n{text}"
-
-            # Add memory context
-            if self.memory:
-                memory_vars = self.memory.load_memory_variables({})
-                if "chat_history" in memory_vars:
-                    for msg in memory_vars["chat_history"][-5:]:
-                        text += f"\n{msg.content}"
-
-            return len(encoding.encode(text))
-        except (LookupError, ValueError, ImportError, TypeError):
-            # Fallback estimation (4 characters per token average)
-            total_length = len(query)
-            if context:
-                total_length += len(context)
-            return total_length // 4
+    def _estimate_token_count(
+        self, query: str, context: Optional[str] = None, messages: Optional[List[BaseMessage]] = None
+    ) -> int:
+        """Estimate token count for query and context, or for already prepared ``messages``"""
+        # Counted per piece so each memory message is encoded once, not on every call
+        if messages is not None:
+            return sum(_count_tokens(str(m.content)) for m in messages)
+        total = _count_tokens(query)
+        if context:
+            total += _count_tokens(context)
+
+        # Add memory context
+        if self.memory:
+            memory_vars = self.memory.load_memory_variables({})
+            if "chat_history" in memory_vars:
+                for msg in memory_vars["chat_history"][-5:]:
+                    total += _count_tokens(str(msg.content))
+
+        return total
 
     def _estimate_response_tokens(self, response: str) -> int:
         """Estimate tokens in response"""
-        try:
-            encoding = tiktoken.get_encoding("cl100k_base")
-            return len(encoding.encode(response))
-        except (LookupError, ValueError, ImportError, TypeError):
-            return len(response) // 4
+        encoding = _token_encoder()
+        if encoding is None:
+            return len(response) // _AVG_CHARS_PER_TOKEN
+        return len(encoding.encode(response, disallowed_special=()))
 
     def _record_performance(self, model_id: str, execution_time: float, cost: float, success: bool):
         """Record model performance metrics"""
-        if model_id not in self.model_performance:
-            self.model_performance[model_id] = {}
-
-        # Record performance
-        timestamp = datetime.now().isoformat()
-        self.model_performance[model_id][timestamp] = {
-            "execution_time": execution_time,
-            "cost": cost,
-            "success": success
-        }
-
-        # Keep only recent performance data (last 100 entries)
-        if len(self.model_performance[model_id]) > 100:
-            oldest_key = min(self.model_performance[model_id].keys())
-            del self.model_performance[model_id][oldest_key]
+        performances = self.model_performance.get(model_id)
+        if performances is None:
+            # Bounded, so the oldest record drops off as a new one arrives
+            performances = self.model_performance[model_id] = deque(maxlen=PERFORMANCE_WINDOW)
+            self._performance_totals[model_id] = PerformanceTotals()
+        totals = self._performance_totals[model_id]
+        if len(performances) == performances.maxlen:
+            totals.add(performances[0], sign=-1)
+        record = PerformanceRecord(time.monotonic_ns(), execution_time, cost, success)
+        performances.append(record)
+        totals.add(record)
 
         # Record in usage history
         self.usage_history.append({
@@ -582,7 +979,7 @@ class MultiProviderOrchestrator:
     # Public interface methods
     def chat(self, message: str, **kwargs) -> str:
         """Simple synchronous chat interface"""
-        result = asyncio.run(self.execute_with_optimal_model(message, **kwargs))
+        result = _run_sync(self.execute_with_optimal_model(message, **kwargs))
         return result.get("response", f"Error: {result.get('error', 'Unknown error')}")
 
     async def achat(self, message: str, **kwargs) -> str:
@@ -608,20 +1005,15 @@ class MultiProviderOrchestrator:
     def get_performance_metrics(self) -> Dict[str, Any]:
         """Get performance metrics for all models"""
         metrics = {}
-        for model_id, performances in self.model_performance.items():
-            if not performances:
+        for model_id, totals in self._performance_totals.items():
+            if not totals.calls:
                 continue
 
-            success_count = sum(1 for p in performances.values() if p["success"])
-            total_count = len(performances)
-            avg_time = sum(p["execution_time"] for p in performances.values()) / total_count
-            avg_cost = sum(p["cost"] for p in performances.values()) / total_count
-
             metrics[model_id] = {
-                "success_rate": success_count / total_count if total_count > 0 else 0,
-                "average_execution_time": avg_time,
-                "average_cost": avg_cost,
-                "total_calls": total_count
+                "success_rate": totals.successes / totals.calls,
+                "average_execution_time": totals.total_time / totals.calls,
+                "average_cost": totals.total_cost / totals.calls,
+                "total_calls": totals.calls
             }
 
         return {
@@ -631,6 +1023,16 @@ class MultiProviderOrchestrator:
             "total_calls": len(self.usage_history)
         }
 
+    async def aclose(self):
+        """Close the running loop's HTTP connection pool; the next call from this loop opens a new one"""
+        entry = self._loop_models.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[0].aclose()
+
+    def close(self):
+        """Synchronous ``aclose`` for the pool that serves ``chat``, closed on its own loop"""
+        _run_sync(self.aclose())
+
     def reset_session(self):
         """Reset session metrics"""
         self.current_session_cost = 0.0
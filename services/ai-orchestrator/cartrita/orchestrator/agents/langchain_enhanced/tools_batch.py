@@ -0,0 +1,88 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .base_tool import AdvancedCartritaTool, ToolCategory
+
+
+class BatchInvocation(BaseModel):
+    tool_name: str = Field(description="Name of the tool to call")
+    arguments: Dict[str, Any] = Field(default_factory=dict, description="Keyword arguments for the tool")
+
+
+class BatchToolInput(BaseModel):
+    invocations: List[BatchInvocation] = Field(description="Independent tool calls to run in parallel")
+
+
+class BatchTool(AdvancedCartritaTool):
+    name: str = "batch_tools"
+    description: str = (
+        "Run several independent tool calls at once. Pass invocations as a list of "
+        '{"tool_name": ..., "arguments": {...}}; results come back in the same order. '
+        "Use this instead of calling tools one after another when no call needs another's output."
+    )
+    category: ToolCategory = ToolCategory.SYSTEM
+    cost_factor: float = 0.0
+    deterministic: bool = True
+    args_schema: Any = BatchToolInput
+
+    # Live view of the owning agent's tools, assigned by AdvancedToolAgent
+    _registry: Dict[str, AdvancedCartritaTool] = {}
+
+    def _resolve(self, invocations: List[Any]) -> List[tuple]:
+        resolved = []
+        for invocation in invocations:
+            if isinstance(invocation, BaseModel):
+                invocation = invocation.model_dump()
+            tool_name = invocation.get("tool_name")
+            tool = self._registry.get(tool_name) if tool_name != self.name else None
+            resolved.append((tool_name, tool, invocation.get("arguments") or {}))
+        return resolved
+
+    @staticmethod
+    def _format(results: List[tuple]) -> str:
+        return json.dumps([
+            {"tool_name": tool_name, "error": str(output)} if isinstance(output, BaseException)
+            else {"tool_name": tool_name, "output": output}
+            for tool_name, output in results
+        ])
+
+    # Inner calls go through the tools' public invoke path with the batch's child callbacks,
+    # so the agent's tool-use recorder sees (and charges for) each of them
+    def _run(self, *args, run_manager: Optional[Any] = None, **kwargs: Any) -> str:
+        callbacks = run_manager.get_child() if run_manager else None
+        return super()._run(*args, run_manager=run_manager, callbacks=callbacks, **kwargs)
+
+    async def _arun(self, *args, run_manager: Optional[Any] = None, **kwargs: Any) -> str:
+        callbacks = run_manager.get_child() if run_manager else None
+        return await super()._arun(*args, run_manager=run_manager, callbacks=callbacks, **kwargs)
+
+    def do_execute(self, *args, callbacks: Any = None, **kwargs) -> str:
+        invocations = kwargs.get("invocations", args[0] if args else [])
+        results = []
+        for tool_name, tool, arguments in self._resolve(invocations):
+            if tool is None:
+                results.append((tool_name, ValueError(f"Unknown tool: {tool_name}")))
+                continue
+            try:
+                results.append((tool_name, tool.invoke(arguments, config={"callbacks": callbacks})))
+            except Exception as e:
+                results.append((tool_name, e))
+        return self._format(results)
+
+    async def do_aexecute(self, *args, callbacks: Any = None, **kwargs) -> str:
+        invocations = self._resolve(kwargs.get("invocations", args[0] if args else []))
+
+        async def unknown(tool_name: str) -> Any:
+            raise ValueError(f"Unknown tool: {tool_name}")
+
+        outputs = await asyncio.gather(
+            *(
+                tool.ainvoke(arguments, config={"callbacks": callbacks}) if tool is not None else unknown(tool_name)
+                for tool_name, tool, arguments in invocations
+            ),
+            return_exceptions=True,
+        )
+        return self._format([(tool_name, output) for (tool_name, _, _), output in zip(invocations, outputs)])
@@ -1,5 +1,110 @@
+import asyncio
+import atexit
+import math as _math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from types import MappingProxyType
+from typing import Optional
+
 from .base_tool import AdvancedCartritaTool, ToolCategory
-from .safe_eval import safe_eval_expression
+from .safe_eval import compile_safe_expression
+
+try:
+    import resource
+
+    RESOURCE_AVAILABLE = True
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    RESOURCE_AVAILABLE = False
+
+# Warm sandbox workers shared by every CodeExecutorTool in the process
+CODE_POOL_WORKERS = int(os.getenv("CODE_EXECUTOR_WORKERS", "4"))
+# CPU seconds a single evaluation may use before the worker is killed
+CODE_CPU_LIMIT_S = int(os.getenv("CODE_EXECUTOR_CPU_LIMIT", "5"))
+# Address space a worker may grow by beyond what it inherited at start-up
+CODE_MEMORY_HEADROOM_MB = int(os.getenv("CODE_EXECUTOR_MEMORY_HEADROOM_MB", "256"))
+
+# Names code may reference; the expression grammar has no assignment, so one
+# globals namespace can be shared by every evaluation
+_ALLOWED_NAMES = MappingProxyType({
+    'len': len, 'str': str, 'int': int, 'float': float, 'abs': abs, 'round': round,
+    'min': min, 'max': max, 'sum': sum, 'range': range, 'enumerate': enumerate,
+    'zip': zip, 'list': list, 'dict': dict, 'tuple': tuple, 'set': set,
+    'pi': _math.pi, 'e': _math.e, 'sin': _math.sin, 'cos': _math.cos, 'tan': _math.tan,
+    'sqrt': _math.sqrt, 'log': _math.log, 'exp': _math.exp,
+})
+_SANDBOX_GLOBALS = {'__builtins__': {}, **_ALLOWED_NAMES}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _init_sandbox() -> None:
+    """Cap the worker's address space once, when it starts"""
+    if not RESOURCE_AVAILABLE:
+        return
+    try:
+        with open("/proc/self/statm") as statm:
+            current = int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return
+    limit = current + CODE_MEMORY_HEADROOM_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _sandboxed_eval(code: str) -> str:
+    if RESOURCE_AVAILABLE:
+        # RLIMIT_CPU counts the worker's lifetime, so re-arm it relative to what is already used
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (int(usage.ru_utime + usage.ru_stime) + CODE_CPU_LIMIT_S, hard))
+    try:
+        return str(eval(compile_safe_expression(code, _ALLOWED_NAMES), _SANDBOX_GLOBALS, {}))
+    except Exception as e:
+        return f"Execution error: {e}"
+
+
+def _pool_context():
+    # Forking the (multithreaded) host process can deadlock and leaks its pipe ends into
+    # the workers; start them from a clean forkserver that has this module preloaded
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=CODE_POOL_WORKERS, mp_context=_pool_context(), initializer=_init_sandbox
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a pool whose worker died (e.g. hit its CPU limit) so the next call starts fresh"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=True, cancel_futures=True)
+
+
+def shutdown_code_pool() -> None:
+    """Stop the sandbox workers and wait for them to exit; the next call starts a new pool"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_code_pool)
 
 
 class CodeExecutorTool(AdvancedCartritaTool):
@@ -7,9 +112,11 @@ class CodeExecutorTool(AdvancedCartritaTool):
     description: str = "Execute code safely in sandboxed environment"
     category: ToolCategory = ToolCategory.CODE_EXECUTION
     cost_factor: float = 3.0
+    deterministic: bool = True
     rate_limit: int = 5
+    timeout_s: float = 5.0
 
-    def do_execute(self, *args, **kwargs) -> str:
+    def _parse(self, args, kwargs):
         if args:
             code = str(args[0])
             language = str(args[1]) if len(args) > 1 else str(kwargs.get("language", "python"))
@@ -18,19 +125,33 @@ class CodeExecutorTool(AdvancedCartritaTool):
             language = str(kwargs.get("language", "python"))
 
         if not code:
-            return "code is required"
+            return None, "code is required"
         if language.lower() != "python":
-            return f"Language {language} not supported. Only Python is available."
-
-        import math as _math
-        allowed = {
-            'len': len, 'str': str, 'int': int, 'float': float, 'abs': abs, 'round': round,
-            'min': min, 'max': max, 'sum': sum, 'range': range, 'enumerate': enumerate,
-            'zip': zip, 'list': list, 'dict': dict, 'tuple': tuple, 'set': set,
-            'pi': _math.pi, 'e': _math.e, 'sin': _math.sin, 'cos': _math.cos, 'tan': _math.tan,
-            'sqrt': _math.sqrt, 'log': _math.log, 'exp': _math.exp,
-        }
+            return None, f"Language {language} not supported. Only Python is available."
+        return code, None
+
+    def _submit(self, code: str):
+        pool = _get_pool()
+        return pool, pool.submit(_sandboxed_eval, code)
+
+    def do_execute(self, *args, **kwargs) -> str:
+        code, message = self._parse(args, kwargs)
+        if code is None:
+            return message
+        pool, future = self._submit(code)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            return "Execution error: sandbox worker terminated"
+
+    async def do_aexecute(self, *args, **kwargs) -> str:
+        code, message = self._parse(args, kwargs)
+        if code is None:
+            return message
+        pool, future = self._submit(code)
         try:
-            return str(safe_eval_expression(code, allowed))
-        except Exception as e:
-            return f"Execution error: {e}"
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            await asyncio.to_thread(_discard_pool, pool)
+            return "Execution error: sandbox worker terminated"
@@ -1,5 +1,11 @@
+import tempfile
+from pathlib import Path
+
 from .base_tool import AdvancedCartritaTool, ToolCategory
 
+# Reads larger than this are refused rather than materialized in memory
+READ_MAX_BYTES = 10 * 1024 * 1024
+
 
 class FileSystemTool(AdvancedCartritaTool):
     name: str = "file_system"
@@ -7,11 +13,9 @@ class FileSystemTool(AdvancedCartritaTool):
     category: ToolCategory = ToolCategory.FILE_SYSTEM
     cost_factor: float = 0.2
     rate_limit: int = 30
+    blocking: bool = True
 
     def do_execute(self, *args, **kwargs) -> str:
-        import tempfile
-        from pathlib import Path
-
         if args and len(args) >= 2:
             operation = str(args[0])
             path = str(args[1])
@@ -29,9 +33,12 @@ class FileSystemTool(AdvancedCartritaTool):
         target_path = safe_base / Path(path).name
 
         def op_read():
-            if target_path.exists():
-                return target_path.read_text()
-            return f"File {target_path} does not exist"
+            if not target_path.exists():
+                return f"File {target_path} does not exist"
+            size = target_path.stat().st_size
+            if size > READ_MAX_BYTES:
+                return f"File {target_path} is too large to read ({size} bytes > {READ_MAX_BYTES})"
+            return target_path.read_text()
 
         def op_write():
             if content is not None:
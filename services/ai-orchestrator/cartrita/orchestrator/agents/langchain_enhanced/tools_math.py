@@ -1,17 +1,57 @@
+import ast
+import math
+import re
+from functools import lru_cache
+from types import CodeType, MappingProxyType
+from typing import Optional
+
 from .base_tool import AdvancedCartritaTool, ToolCategory
 
+# "calculate 2+2", "compute (3 * 4) / 2" -- arithmetic only, no free text
+_DIRECT_EXPRESSION_RE = re.compile(r"^\s*(?:calculate|compute|what is)\s+([\d\s.+\-*/()]*\d[\d\s.+\-*/()]*)\??\s*$", re.IGNORECASE)
+
+
+# Functions and constants expressions may reference; nothing else is in scope
+_FUNCTIONS = MappingProxyType({
+    'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+    'sqrt': math.sqrt, 'log': math.log, 'exp': math.exp,
+    'abs': abs, 'round': round, 'min': min, 'max': max,
+    'pi': math.pi, 'e': math.e
+})
+_SAFE_GLOBALS = {'__builtins__': {}, **_FUNCTIONS}
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load, ast.Call,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.BitXor, ast.USub,
+)
+
+
+@lru_cache(maxsize=1024)
+def _compile_expression(expression: str) -> CodeType:
+    """Validate an expression against the arithmetic whitelist and compile it once"""
+    tree = ast.parse(expression, mode='eval')
+    for node in ast.walk(tree):
+        if (
+            not isinstance(node, _ALLOWED_NODES)
+            or (isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, complex)))
+            or (isinstance(node, ast.Name) and node.id not in _FUNCTIONS)
+            or (isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.keywords))
+        ):
+            raise TypeError(f"Unsupported operation: {ast.dump(node)}")
+    return compile(tree, '<math>', 'eval')
+
 
 class MathCalculatorTool(AdvancedCartritaTool):
     name: str = "math_calculator"
     description: str = "Perform mathematical calculations and evaluations"
     category: ToolCategory = ToolCategory.COMPUTATION
     cost_factor: float = 0.1
+    deterministic: bool = True
 
-    def do_execute(self, *args, **kwargs) -> str:
-        import ast
-        import operator
-        import math
+    def try_direct_parse(self, query: str) -> Optional[dict]:
+        match = _DIRECT_EXPRESSION_RE.match(query)
+        return {"expression": match.group(1).strip()} if match else None
 
+    def do_execute(self, *args, **kwargs) -> str:
         if kwargs.get("expression") is not None:
             expression = str(kwargs["expression"])
         elif args:
@@ -19,34 +59,7 @@ class MathCalculatorTool(AdvancedCartritaTool):
         else:
             raise ValueError("expression is required")
 
-        ops = {
-            ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
-            ast.Div: operator.truediv, ast.Pow: operator.pow, ast.BitXor: operator.xor,
-            ast.USub: operator.neg,
-        }
-        fun = {
-            'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
-            'sqrt': math.sqrt, 'log': math.log, 'exp': math.exp,
-            'abs': abs, 'round': round, 'min': min, 'max': max,
-            'pi': math.pi, 'e': math.e
-        }
-
-        def ev(n):
-            if isinstance(n, ast.Num):
-                return n.n
-            if isinstance(n, ast.BinOp):
-                return ops[type(n.op)](ev(n.left), ev(n.right))
-            if isinstance(n, ast.UnaryOp):
-                return ops[type(n.op)](ev(n.operand))
-            if isinstance(n, ast.Name):
-                return fun.get(n.id, 0)
-            if isinstance(n, ast.Call):
-                f = n.func.id
-                if f in fun:
-                    return fun[f](*[ev(a) for a in n.args])
-            raise TypeError(f"Unsupported operation: {n}")
-
         try:
-            return f"Result: {ev(ast.parse(expression, mode='eval').body)}"
+            return f"Result: {eval(_compile_expression(expression), _SAFE_GLOBALS, {})}"
         except Exception as e:
             raise ValueError(f"Invalid mathematical expression: {e}")
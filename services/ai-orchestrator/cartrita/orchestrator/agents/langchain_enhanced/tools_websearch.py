@@ -1,8 +1,13 @@
-from typing import Any, Dict
-from datetime import datetime, timedelta
+import threading
 import time
 
-from .base_tool import AdvancedCartritaTool, ToolCategory, ToolMetrics
+from cachetools import TTLCache
+
+from .base_tool import AdvancedCartritaTool, ToolCategory
+
+# Search results are reused for an hour; the cache is bounded so it can't grow forever
+SEARCH_CACHE_MAXSIZE = 1024
+SEARCH_CACHE_TTL = 3600
 
 
 class WebSearchTool(AdvancedCartritaTool):
@@ -11,13 +16,15 @@ class WebSearchTool(AdvancedCartritaTool):
     category: ToolCategory = ToolCategory.WEB_SEARCH
     cost_factor: float = 2.0
     rate_limit: int = 10
+    timeout_s: float = 10.0
+    # Searching is network I/O, so the async path runs it on a worker thread where timeout_s can cut it off
+    blocking: bool = True
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        if not hasattr(self, "_metrics"):
-            self._metrics = ToolMetrics(name=self.name)
-        self._search_cache: Dict[str, Any] = {}
-        self._cache_expiry: Dict[str, datetime] = {}
+        self._search_cache: TTLCache = TTLCache(maxsize=SEARCH_CACHE_MAXSIZE, ttl=SEARCH_CACHE_TTL)
+        # TTLCache isn't thread-safe and searches run on worker threads
+        self._search_cache_lock = threading.Lock()
 
     def do_execute(self, *args, **kwargs) -> str:
         def parse_args():
@@ -30,41 +37,22 @@ class WebSearchTool(AdvancedCartritaTool):
             return "query is required"
 
         cache_key = f"{query}:{num_results}"
-        if (
-            cache_key in self._search_cache
-            and cache_key in self._cache_expiry
-            and self._cache_expiry[cache_key] > datetime.utcnow()
-        ):
+        with self._search_cache_lock:
+            hit = self._search_cache.get(cache_key)
+        if hit is not None:
             self._record_cache_hit()
-            return self._search_cache[cache_key]
-
-        results = [
-            {
-                "title": f"Search result {i + 1} for '{query}'",
-                "url": f"https://example.com/result-{i + 1}",
-                "snippet": f"This is a relevant snippet about {query} from result {i + 1}",
-            }
-            for i in range(min(num_results, 5))
-        ]
-
-        formatted = [
-            f"{i}. {r['title']}\n   {r['snippet']}\n   URL: {r['url']}"
-            for i, r in enumerate(results, 1)
-        ]
-        text = "\n\n".join(formatted)
-        self._search_cache[cache_key] = text
-        self._cache_expiry[cache_key] = datetime.utcnow() + timedelta(hours=1)
+            return hit
+
+        text = "\n\n".join(
+            f"{i}. Search result {i} for '{query}'\n"
+            f"   This is a relevant snippet about {query} from result {i}\n"
+            f"   URL: https://example.com/result-{i}"
+            for i in range(1, min(num_results, 5) + 1)
+        )
+        with self._search_cache_lock:
+            self._search_cache[cache_key] = text
         return text
 
     def _record_cache_hit(self) -> None:
-        start = time.time()
-        self._last_call_time = start
-        if not hasattr(self, "_call_history") or self._call_history is None:
-            self._call_history = []
-        self._call_history.append(start)
-        cutoff = start - 3600
-        # filter in-place to avoid reassign lint warning
-        filtered = [t for t in self._call_history if t > cutoff]
-        self._call_history.clear()
-        self._call_history.extend(filtered)
+        self._record_call(time.perf_counter())
         self._update_metrics(True, 0.0)
@@ -163,6 +163,12 @@ class AISettings(BaseSettings):
     agent_timeout: int = Field(
         default=300, ge=30, le=1800, description="Agent execution timeout"
     )
+    rag_timeout: int = Field(
+        default=60, ge=5, le=600, description="Knowledge RAG answer generation timeout"
+    )
+    semantic_cache_ttl: int = Field(
+        default=900, ge=30, le=86400, description="Seconds a knowledge semantic-cache answer stays reusable"
+    )
     max_agent_memory: str = Field(default="2GB", description="Max memory per agent")
 
     class Config:
@@ -0,0 +1,125 @@
+# Cartrita AI OS - Semantic Cache
+# Embedding-similarity cache shared by the agents
+
+"""
+Cosine-similarity cache of previous answers keyed by query embeddings.
+"""
+
+import time
+from typing import Any
+
+import numpy as np
+
+try:
+    import faiss  # type: ignore
+
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+
+# Default tuning
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES = 10_000
+# Nearest neighbours examined per lookup, so a close entry stored under another
+# signature doesn't hide a matching one just behind it
+SEMANTIC_CACHE_CANDIDATES = 8
+
+
+class SemanticQueryCache:
+    """Cosine-similarity cache of previous answers keyed by query embeddings.
+
+    Paraphrased queries ("What is X?" / "Tell me about X") miss an exact-match
+    cache. Here each query is embedded once and compared against prior query
+    embeddings; a hit above ``threshold`` reuses the stored answer and skips
+    the generation call entirely. Uses a FAISS HNSW inner-product index when
+    faiss is installed, otherwise a flat NumPy matrix whose capacity doubles
+    as it fills. With ``ttl`` set, entries older than ``ttl`` seconds no longer
+    match.
+    """
+
+    def __init__(
+        self,
+        dim: int | None = None,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl: float | None = None,
+        candidates: int = SEMANTIC_CACHE_CANDIDATES,
+    ):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.candidates = candidates
+        self._index: Any | None = None
+        self._matrix: np.ndarray | None = None
+        self._entries: list[tuple[tuple[Any, ...], Any, float]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def normalize(vector: list[float] | np.ndarray) -> np.ndarray:
+        """Return an L2-normalized float32 row vector."""
+        vec = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def lookup(self, vector: np.ndarray, signature: tuple[Any, ...]) -> Any | None:
+        """Return the closest live value stored under ``signature`` if above threshold."""
+        count = len(self._entries)
+        if not count:
+            return None
+
+        k = min(self.candidates, count)
+        if self._index is not None:
+            scores, ids = self._index.search(vector, k)
+            ranked = zip(scores[0].tolist(), ids[0].tolist())
+        else:
+            sims = self._matrix[:count] @ vector[0]
+            top = np.argpartition(-sims, k - 1)[:k] if k < count else np.arange(count)
+            top = top[np.argsort(-sims[top])]
+            ranked = zip(sims[top].tolist(), top.tolist())
+
+        now = time.monotonic()
+        for score, entry_id in ranked:
+            if score < self.threshold:
+                break
+            if entry_id < 0:
+                continue
+            entry_signature, value, added_at = self._entries[entry_id]
+            if entry_signature == signature and (self.ttl is None or now - added_at <= self.ttl):
+                return value
+        return None
+
+    def add(self, vector: np.ndarray, signature: tuple[Any, ...], value: Any) -> None:
+        """Store ``value`` under ``vector``; the cache resets when full."""
+        if len(self._entries) >= self.max_entries:
+            self.clear()
+
+        if self.dim is None:
+            self.dim = vector.shape[1]
+
+        if FAISS_AVAILABLE:
+            if self._index is None:
+                self._index = faiss.IndexHNSWFlat(self.dim, 32, faiss.METRIC_INNER_PRODUCT)
+            self._index.add(vector)
+        else:
+            count = len(self._entries)
+            if self._matrix is None or count == len(self._matrix):
+                # Grown geometrically so adds stay amortized O(1) without reserving
+                # max_entries rows up front
+                capacity = min(max(2 * count, 64), self.max_entries)
+                grown = np.empty((capacity, self.dim), dtype=np.float32)
+                if count:
+                    grown[:count] = self._matrix[:count]
+                self._matrix = grown
+            self._matrix[count] = vector[0]
+
+        self._entries.append((signature, value, time.monotonic()))
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        self._index = None
+        self._matrix = None
+        self._entries.clear()
@@ -0,0 +1,479 @@
+import asyncio
+import importlib
+import json
+import os
+
+import pytest
+
+os.environ.setdefault("CARTRITA_DISABLE_DB", "1")
+
+pytest.importorskip("langchain")
+
+agent_mod = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.advanced_tool_agent")
+math_mod = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.tools_math")
+
+
+def _make_agent(**kwargs):
+    return agent_mod.AdvancedToolAgent(**kwargs)
+
+
+def test_agent_built_lazily_once_after_bulk_tool_changes(monkeypatch):
+    agent = _make_agent()
+    builds = []
+    original = agent._create_agent
+    monkeypatch.setattr(agent_mod.AdvancedToolAgent, "_create_agent", lambda self: (builds.append(1), original()))
+
+    assert agent.agent_executor is None
+    agent.remove_tool("web_search")
+    agent.add_tools([math_mod.MathCalculatorTool(name="calc_two")])
+
+    agent._ensure_agent()
+    agent._ensure_agent()
+
+    assert len(builds) == 1
+    assert agent.agent_executor is not None
+    assert "calc_two" in agent.tools and "web_search" not in agent.tools
+    assert agent._tool_names_cached == ", ".join(agent.tools)
+
+
+class _CountingExecutor:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, inputs, config=None):
+        self.calls += 1
+        return {"output": f"answer {self.calls}"}
+
+
+def _with_fake_executor(agent):
+    executor = _CountingExecutor()
+    agent._agent_dirty = False
+    agent.agent_executor = executor
+    agent._stateless_executor = executor
+    return executor
+
+
+def test_execute_with_tools_caches_identical_queries():
+    agent = _make_agent()
+    executor = _with_fake_executor(agent)
+
+    assert agent.execute_with_tools("what is 2+2") == "answer 1"
+    assert agent.execute_with_tools("what is 2+2") == "answer 1"
+    assert agent.execute_with_tools("what is 2+2", cache_bypass=True) == "answer 2"
+    assert executor.calls == 2
+
+
+def test_sync_calls_share_one_persistent_event_loop():
+    agent = _make_agent()
+    executor = _with_fake_executor(agent)
+    loops = []
+
+    async def recording_ainvoke(inputs, config=None):
+        loops.append(asyncio.get_running_loop())
+        return {"output": inputs["input"]}
+
+    executor.ainvoke = recording_ainvoke
+    agent.execute_with_tools("first question")
+    agent.execute_with_tools("second question")
+    agent.run_batch(["third question"])
+
+    assert len(loops) == 3 and len(set(loops)) == 1
+    assert not loops[0].is_closed()
+
+
+def test_response_cache_skips_side_effects_and_tracks_memory():
+    from types import SimpleNamespace
+
+    agent = _make_agent(response_cache_ttl=60)
+    executor = _with_fake_executor(agent)
+    agent._memory = SimpleNamespace(chat_memory=SimpleNamespace(messages=[]), clear=lambda: None)
+    used = {"tool": "file_system", "remember": False}
+
+    async def ainvoke_with_tool(inputs, config=None):
+        executor.calls += 1
+        for handler in config["callbacks"]:
+            handler.on_tool_start({"name": used["tool"]}, inputs["input"])
+        if used["remember"]:
+            agent._memory.chat_memory.messages.append(inputs["input"])
+        return {"output": f"answer {executor.calls}"}
+
+    executor.ainvoke = ainvoke_with_tool
+    agent.execute_with_tools("write hello to note.txt")
+    agent.execute_with_tools("write hello to note.txt")
+    assert executor.calls == 2
+
+    used["tool"] = "math_calculator"
+    assert agent.execute_with_tools("add some numbers") == "answer 3"
+    assert agent.execute_with_tools("add some numbers") == "answer 3"
+
+    used["remember"] = True
+    assert agent.execute_with_tools("and now multiply") == "answer 4"
+    assert agent.execute_with_tools("add some numbers") == "answer 5"
+    assert agent._response_cache.ttl == 60
+
+
+@pytest.mark.asyncio
+async def test_aexecute_with_tools_awaits_executor():
+    agent = _make_agent()
+    executor = _with_fake_executor(agent)
+
+    assert await agent.aexecute_with_tools("what is 2+2") == "answer 1"
+    assert executor.calls == 1
+    assert isinstance(agent.tool_usage_history[-1]["timestamp_ns"], int)
+
+    exported = agent.export_usage_history()[-1]
+    assert exported["timestamp"].endswith("+00:00")
+    assert exported["query"] == "what is 2+2"
+
+
+def test_usage_history_is_bounded_and_truncated():
+    agent = _make_agent(history_limit=2)
+    executor = _with_fake_executor(agent)
+
+    async def long_output(inputs, config=None):
+        executor.calls += 1
+        return {"output": "x" * 5000}
+
+    executor.ainvoke = long_output
+    for i in range(3):
+        agent.execute_with_tools(f"query {i}")
+
+    assert [h["query"] for h in agent.tool_usage_history] == ["query 1", "query 2"]
+    assert len(agent.tool_usage_history[-1]["result"]) == agent_mod.HISTORY_RESULT_MAX_CHARS
+
+
+def test_tool_recommendations_match_whole_keywords_in_category_order():
+    agent = _make_agent()
+
+    assert agent.get_tool_recommendations("please search the web then calculate") == [
+        "math_calculator",
+        "web_search",
+    ]
+    assert agent.get_tool_recommendations("hello there") == list(agent.tools)
+
+
+def test_tool_categories_track_add_and_remove():
+    agent = _make_agent()
+    agent.add_tool(math_mod.MathCalculatorTool(name="calc_two"))
+
+    computation = agent.tool_categories[agent_mod.ToolCategory.COMPUTATION]
+    assert computation == {"math_calculator", "calc_two"}
+
+    agent.remove_tool("math_calculator")
+    assert computation == {"calc_two"}
+    assert agent.get_tool_metrics()["tool_categories"]["computation"] == 1
+
+
+class _PlanningLLM:
+    def __init__(self, plan):
+        self.plan = plan
+
+    async def ainvoke(self, messages):
+        return type("Resp", (), {"content": self.plan})()
+
+
+@pytest.mark.asyncio
+async def test_jit_plan_runs_tool_dag_without_executor():
+    plan = (
+        '[{"id": "a", "tool": "math_calculator", "args": {"expression": "2+3"}, "deps": []},'
+        ' {"id": "b", "tool": "math_calculator", "args": {"expression": "4*5"}, "deps": []}]'
+    )
+    agent = _make_agent(llm=_PlanningLLM(plan), enable_jit_planning=True)
+    executor = _with_fake_executor(agent)
+
+    layers = await agent._jit_plan("add and multiply")
+    assert [len(layer) for layer in layers] == [2]
+
+    assert await agent.aexecute_with_tools("add and multiply") == "Result: 5\nResult: 20"
+    assert executor.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_invalid_jit_plan_falls_back_to_executor():
+    plan = '[{"id": "a", "tool": "math_calculator", "args": {}, "deps": ["b"]}]'
+    agent = _make_agent(llm=_PlanningLLM(plan), enable_jit_planning=True)
+    executor = _with_fake_executor(agent)
+
+    assert await agent._jit_plan("q") is None
+    assert await agent.aexecute_with_tools("q") == "answer 1"
+    assert executor.calls == 1
+
+
+def test_memory_is_pruned_to_token_limit():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    class _WordCountingLLM(FakeListChatModel):
+        def get_num_tokens_from_messages(self, messages, tools=None):
+            return sum(len(m.content.split()) for m in messages)
+
+    agent = _make_agent(llm=_WordCountingLLM(responses=["ok"]), memory_token_limit=5)
+    agent.memory.save_context({"input": "a long opening question"}, {"output": "a long opening answer"})
+    agent.memory.save_context({"input": "q2"}, {"output": "a2"})
+
+    history = agent.memory.load_memory_variables({})["chat_history"]
+    assert [m.content for m in history] == ["q2", "a2"]
+
+
+def test_session_cost_reflects_tools_actually_used():
+    agent = _make_agent()
+    executor = _with_fake_executor(agent)
+
+    async def ainvoke_with_steps(inputs, config=None):
+        executor.calls += 1
+        for handler in config["callbacks"]:
+            assert handler.run_inline
+            handler.on_tool_start({"name": "math_calculator"}, "2+2")
+            handler.on_tool_start({"name": "math_calculator"}, "4")
+        return {"output": "4"}
+
+    executor.ainvoke = ainvoke_with_steps
+    agent.execute_with_tools("calculate the sum of two and two")
+
+    cost_factor = agent.tools["math_calculator"].cost_factor
+    assert agent.current_session_cost == pytest.approx(2 * cost_factor)
+    assert agent.tool_usage_history[-1]["tools_used"] == ["math_calculator", "math_calculator"]
+    assert agent.tool_usage_history[-1]["total_tokens"] == 0
+
+
+def test_direct_tool_invocation_skips_agent_loop():
+    agent = _make_agent()
+    executor = _with_fake_executor(agent)
+
+    assert agent.execute_with_tools("calculate (2 + 3) * 4") == "Result: 20"
+    assert executor.calls == 0
+    assert agent.tool_usage_history[-1]["tools_used"] == ["math_calculator"]
+
+    agent.execute_with_tools("calculate the area of a circle")
+    assert executor.calls == 1
+
+
+def test_langchain_loaded_only_when_agent_is_built(monkeypatch):
+    monkeypatch.setattr(agent_mod, "_langchain", None)
+    agent = _make_agent()
+
+    agent.export_tool_configuration()
+    agent.reset_session()
+    assert agent_mod._langchain is None
+
+    agent._ensure_agent()
+    assert agent_mod._langchain
+    assert agent.agent_executor is not None
+
+
+def test_tool_recommendations_memoized_until_tools_change(monkeypatch):
+    agent = _make_agent()
+    calls = []
+    original = agent._recommend
+    monkeypatch.setattr(agent_mod.AdvancedToolAgent, "_recommend", lambda self, q: (calls.append(q), original(q))[1])
+
+    assert agent.get_tool_recommendations("Search the web") == ["web_search"]
+    assert agent.get_tool_recommendations("search the WEB") == ["web_search"]
+    assert len(calls) == 1
+
+    agent.remove_tool("web_search")
+    assert agent.get_tool_recommendations("search the web") == list(agent.tools)
+    assert len(calls) == 2
+
+
+def test_export_tool_configuration_bytes_reserializes_only_on_change():
+    agent = _make_agent()
+
+    first = agent.export_tool_configuration_bytes()
+    assert json.loads(first)["tools"]["math_calculator"]["category"] == "computation"
+    assert agent.export_tool_configuration_bytes() is first
+
+    agent.tools["math_calculator"].invoke({"expression": "1+1"})
+    refreshed = agent.export_tool_configuration_bytes()
+    assert refreshed is not first
+    assert json.loads(refreshed)["metrics"]["individual_tools"]["math_calculator"]["last_used"]
+
+    agent.max_cost_per_session = 5.0
+    reconfigured = agent.export_tool_configuration_bytes()
+    assert json.loads(reconfigured)["configuration"]["max_cost_per_session"] == 5.0
+
+    agent.tool_usage_history.append({"timestamp_ns": 0, "query": "q"})
+    assert json.loads(agent.export_tool_configuration_bytes())["metrics"]["usage_history_count"] == 1
+
+
+def test_tool_metrics_snapshot_refreshed_after_tool_use():
+    agent = _make_agent()
+    before = agent.get_tool_metrics()["individual_tools"]["math_calculator"]
+    assert before["total_calls"] == 0
+
+    agent.tools["math_calculator"].invoke({"expression": "1+1"})
+    after = agent.get_tool_metrics()["individual_tools"]["math_calculator"]
+    assert after["total_calls"] == 1
+    assert before["total_calls"] == 0
+
+
+@pytest.mark.asyncio
+async def test_acreate_builds_default_tools_concurrently():
+    agent = await agent_mod.AdvancedToolAgent.acreate()
+
+    assert list(agent.tools) == [cls().name for cls in agent_mod.DEFAULT_TOOL_CLASSES] + ["batch_tools"]
+    assert agent._tool_names_cached == ", ".join(agent.tools)
+
+
+def test_agent_has_no_instance_dict():
+    agent = _make_agent()
+
+    assert not hasattr(agent, "__dict__")
+    with pytest.raises(AttributeError):
+        agent.unexpected_attribute = 1
+
+
+def test_rate_limited_tool_refused_before_agent_runs():
+    agent = _make_agent()
+    executor = _with_fake_executor(agent)
+
+    async def ainvoke_with_search(inputs, config=None):
+        executor.calls += 1
+        for handler in config["callbacks"]:
+            handler.on_tool_start({"name": "web_search"}, inputs["input"])
+        return {"output": "found"}
+
+    executor.ainvoke = ainvoke_with_search
+    rate_limit = agent.tools["web_search"].rate_limit
+    for i in range(rate_limit):
+        assert agent.execute_with_tools(f"search the web for topic {i}") == "found"
+
+    blocked = agent.execute_with_tools("search the web for one more topic")
+    assert blocked.startswith("Rate limit imminent for web_search")
+    assert executor.calls == rate_limit
+
+
+@pytest.mark.asyncio
+async def test_batch_tool_runs_invocations_concurrently_in_order():
+    agent = _make_agent()
+    batch = agent.tools["batch_tools"]
+
+    raw = await batch.ainvoke({"invocations": [
+        {"tool_name": "math_calculator", "arguments": {"expression": "1+2"}},
+        {"tool_name": "web_search", "arguments": {"query": "cartrita"}},
+        {"tool_name": "missing_tool"},
+    ]})
+    results = json.loads(raw)
+
+    assert [r["tool_name"] for r in results] == ["math_calculator", "web_search", "missing_tool"]
+    assert results[0]["output"] == "Result: 3"
+    assert "cartrita" in results[1]["output"]
+    assert results[2]["error"] == "Unknown tool: missing_tool"
+
+
+def test_batched_tool_calls_are_charged_to_the_session():
+    code_mod = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.tools_code")
+    agent = _make_agent()
+    executor = _with_fake_executor(agent)
+
+    async def ainvoke_with_batch(inputs, config=None):
+        executor.calls += 1
+        raw = await agent.tools["batch_tools"].ainvoke(
+            {"invocations": [{"tool_name": "code_executor", "arguments": {"code": "6 * 7"}}]}, config=config
+        )
+        return {"output": raw}
+
+    executor.ainvoke = ainvoke_with_batch
+    try:
+        output = agent.execute_with_tools("please run these independent steps")
+    finally:
+        code_mod.shutdown_code_pool()
+
+    assert json.loads(output)[0]["output"] == "42"
+    assert agent.tool_usage_history[-1]["tools_used"] == ["batch_tools", "code_executor"]
+    assert agent.current_session_cost == pytest.approx(agent.tools["code_executor"].cost_factor)
+
+
+@pytest.mark.asyncio
+async def test_run_batch_async_bounds_concurrency_and_keeps_order():
+    agent = _make_agent()
+    executor = _with_fake_executor(agent)
+    in_flight = 0
+    peak = 0
+
+    async def slow_ainvoke(inputs, config=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"output": inputs["input"].upper()}
+
+    executor.ainvoke = slow_ainvoke
+    queries = [f"hello {i}" for i in range(6)]
+
+    results = await agent.run_batch_async(queries, max_concurrency=2, batch_size=4)
+
+    assert results == [q.upper() for q in queries]
+    assert peak == 2
+
+
+def test_keyword_matcher_requires_whole_words():
+    agent = _make_agent()
+
+    assert agent.get_tool_recommendations("rerun the web2 lookup") == ["web_search"]
+    assert agent.get_tool_recommendations("returning files") == list(agent.tools)
+
+
+@pytest.mark.asyncio
+async def test_run_batch_async_reserves_cost_and_skips_memory():
+    agent = _make_agent(max_cost_per_session=0.25)
+    executor = _with_fake_executor(agent)
+    histories = []
+
+    async def ainvoke_with_math(inputs, config=None):
+        histories.append(inputs.get("chat_history"))
+        await asyncio.sleep(0.01)
+        for handler in config["callbacks"]:
+            handler.on_tool_start({"name": "math_calculator"}, inputs["input"])
+        return {"output": "done"}
+
+    executor.ainvoke = ainvoke_with_math
+    results = await agent.run_batch_async([f"calculate the formula {i}" for i in range(6)])
+
+    assert results.count("done") == 3
+    assert results.count("Session cost limit reached. Please start a new session.") == 3
+    assert histories == [[], [], []]
+    assert agent.current_session_cost == pytest.approx(0.3)
+    assert agent._reserved_cost == pytest.approx(0.0)
+
+
+def test_stateless_answers_not_served_to_memory_backed_calls():
+    agent = _make_agent()
+    executor = _with_fake_executor(agent)
+
+    async def ainvoke(inputs, config=None):
+        executor.calls += 1
+        return {"output": f"{'stateless' if 'chat_history' in inputs else 'memory'} {executor.calls}"}
+
+    executor.ainvoke = ainvoke
+    assert asyncio.run(agent.aexecute_with_tools("what is 2+2", use_memory=False)) == "stateless 1"
+    assert asyncio.run(agent.aexecute_with_tools("what is 2+2", use_memory=False)) == "stateless 1"
+    assert agent.execute_with_tools("what is 2+2") == "memory 2"
+
+
+@pytest.mark.asyncio
+async def test_jit_plan_with_schema_violation_or_removed_tool_falls_back(monkeypatch):
+    from pydantic import BaseModel
+
+    class StrictArgs(BaseModel):
+        expression: str
+
+    plan = '[{"id": "a", "tool": "strict", "args": {"expression": 5}, "deps": []}]'
+    agent = _make_agent(llm=_PlanningLLM(plan), enable_jit_planning=True)
+    agent.add_tools([math_mod.MathCalculatorTool(name="strict", args_schema=StrictArgs)])
+    executor = _with_fake_executor(agent)
+
+    assert await agent._jit_plan("q") is None
+    assert await agent.aexecute_with_tools("q") == "answer 1"
+
+    # The planned tool is removed while the planner is still running
+    agent.llm = _PlanningLLM('[{"id": "a", "tool": "math_calculator", "args": {"expression": "1+1"}, "deps": []}]')
+    original = agent_mod.AdvancedToolAgent._jit_plan
+
+    async def plan_then_remove(self, query):
+        layers = await original(self, query)
+        self.remove_tool("math_calculator")
+        return layers
+
+    monkeypatch.setattr(agent_mod.AdvancedToolAgent, "_jit_plan", plan_then_remove)
+    assert await agent._execute_jit_plan("q") is None
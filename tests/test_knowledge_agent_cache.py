@@ -0,0 +1,331 @@
+import asyncio
+import importlib
+import os
+import time
+
+import pytest
+
+os.environ.setdefault("CARTRITA_DISABLE_DB", "1")
+
+knowledge_mod = importlib.import_module("cartrita.orchestrator.agents.knowledge.knowledge_agent")
+semantic_cache_mod = importlib.import_module("cartrita.orchestrator.utils.semantic_cache")
+config_mod = importlib.import_module("cartrita.orchestrator.utils.config")
+
+
+class _FakeEmbedder:
+    """Maps queries onto fixed vectors so paraphrases land close together."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        return self.vectors[text]
+
+
+class _FakeDB:
+    def __init__(self):
+        self.calls = 0
+
+    async def semantic_search(self, **kwargs):
+        self.calls += 1
+        return [{"id": "d1", "title": "Doc", "content": "X is a thing.", "source": "kb", "score": 0.9}]
+
+
+def _make_agent(embedder, db):
+    agent = knowledge_mod.KnowledgeAgent(model="gpt-4.1-mini", api_key="test-key", db_manager=db)
+    agent.knowledge_llm = None
+    agent.fallback_provider = None
+    agent.query_embedder = embedder
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_semantic_cache_hit_on_paraphrase():
+    embedder = _FakeEmbedder({
+        "What is X?": [1.0, 0.0, 0.0],
+        "Tell me about X": [0.99, 0.05, 0.0],
+        "Unrelated": [0.0, 1.0, 0.0],
+    })
+    db = _FakeDB()
+    agent = _make_agent(embedder, db)
+
+    first = await agent.execute([{"role": "user", "content": "What is X?"}], {}, {})
+    second = await agent.execute([{"role": "user", "content": "Tell me about X"}], {}, {})
+
+    assert db.calls == 1
+    assert second["knowledge_data"]["metadata"]["cache"] == "semantic_hit"
+    assert second["response"] == first["response"]
+
+    await agent.execute([{"role": "user", "content": "Unrelated"}], {}, {})
+    assert db.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_semantic_cache_entries_expire(monkeypatch):
+    embedder = _FakeEmbedder({"What is X?": [1.0, 0.0]})
+    db = _FakeDB()
+    agent = _make_agent(embedder, db)
+    assert agent.semantic_cache.ttl == config_mod.get_settings().ai.semantic_cache_ttl
+
+    await agent.execute([{"role": "user", "content": "What is X?"}], {}, {})
+    now = time.monotonic()
+    monkeypatch.setattr(semantic_cache_mod.time, "monotonic", lambda: now + agent.semantic_cache.ttl + 1)
+    await agent.execute([{"role": "user", "content": "What is X?"}], {}, {})
+
+    assert db.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_semantic_cache_respects_query_parameters():
+    embedder = _FakeEmbedder({"What is X?": [1.0, 0.0]})
+    db = _FakeDB()
+    agent = _make_agent(embedder, db)
+
+    await agent.execute([{"role": "user", "content": "What is X?"}], {"top_k": 3}, {})
+    await agent.execute([{"role": "user", "content": "What is X?"}], {"top_k": 7}, {})
+
+    assert db.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_execute_many_preserves_order_and_bounds_concurrency(monkeypatch):
+    monkeypatch.setenv("KNOWLEDGE_AGENT_CONCURRENCY", "2")
+    agent = _make_agent(None, None)
+    in_flight = 0
+    peak = 0
+
+    async def fake_execute(messages, context, metadata):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"response": messages[-1]["content"]}
+
+    agent.execute = fake_execute
+    batch = [([{"role": "user", "content": f"q{i}"}], {}, {}) for i in range(6)]
+
+    results = await agent.execute_many(batch)
+
+    assert [r["response"] for r in results] == [f"q{i}" for i in range(6)]
+    assert peak == 2
+
+
+def test_knowledge_prompt_keeps_static_prefix_first():
+    agent = _make_agent(None, None)
+    docs = agent._convert_raw_results([{"id": "d1", "title": "Doc", "content": "body", "source": "kb", "score": 0.5}])
+
+    first = agent._prepare_rag_context(docs, "first query", "Monday")["user_msg"]
+    second = agent._prepare_rag_context(docs, "other query", "Tuesday")["user_msg"]
+
+    prefix = first[: first.index("<<<SOURCES>>>")]
+    assert second.startswith(prefix)
+    assert first.rstrip().endswith('Query: "first query"')
+
+    summary = agent._create_fallback_summary(docs, {"user_msg": first})
+    assert summary.startswith("Query: first query")
+    assert "Time:" not in summary
+
+
+def test_sources_block_back_references_duplicate_excerpts():
+    agent = _make_agent(None, None)
+    docs = agent._convert_raw_results([
+        {"id": "a", "title": "A", "content": "shared text", "source": "kb"},
+        {"id": "b", "title": "B", "content": "other text", "source": "kb"},
+        {"id": "c", "title": "C", "content": "shared text", "source": "kb"},
+    ])
+
+    block = agent._format_sources_block(docs)
+
+    assert block.count("shared text") == 1
+    assert "Excerpt: (same as [1])" in block
+
+
+@pytest.mark.asyncio
+async def test_execute_stream_yields_llm_chunks():
+    class _Chunk:
+        def __init__(self, content):
+            self.content = content
+
+    class _StreamingLLM:
+        async def astream(self, messages):
+            for part in ("Hello", " ", "world"):
+                yield _Chunk(part)
+
+    agent = _make_agent(None, _FakeDB())
+    agent.knowledge_llm = _StreamingLLM()
+
+    chunks = [c async for c in agent.execute_stream([{"role": "user", "content": "What is X?"}], {}, {})]
+
+    assert chunks == ["Hello", " ", "world"]
+
+
+def test_confidence_score_blends_relevance_and_source_count():
+    agent = _make_agent(None, None)
+    docs = agent._convert_raw_results([
+        {"id": str(i), "title": "T", "content": "c", "source": "kb", "score": 0.8} for i in range(2)
+    ])
+
+    assert agent._calculate_confidence_score([]) == 0.0
+    assert agent._calculate_confidence_score(docs) == pytest.approx((0.8 + 0.4) / 2)
+
+
+def test_agents_share_one_llm_client_per_model_and_key():
+    first = knowledge_mod.KnowledgeAgent(model="gpt-4.1-mini", api_key="test-key")
+    second = knowledge_mod.KnowledgeAgent(model="gpt-4.1-mini", api_key="test-key")
+
+    assert first.knowledge_llm is not None
+    assert first.knowledge_llm is second.knowledge_llm
+
+
+def test_shared_llm_client_is_not_reused_across_event_loops():
+    agent = knowledge_mod.KnowledgeAgent(model="gpt-4.1-mini", api_key="test-key")
+
+    async def current_llm():
+        return agent.knowledge_llm, agent.knowledge_llm
+
+    first_a, first_b = asyncio.run(current_llm())
+    second, _ = asyncio.run(current_llm())
+
+    assert first_a is first_b
+    assert first_a is not second
+
+
+class _ScriptedLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        self.prompts.append(messages[0].content)
+        return type("Resp", (), {"content": "speculative" if "No documents" in messages[0].content else "rag"})()
+
+
+class _EmptyDB:
+    async def semantic_search(self, **kwargs):
+        return []
+
+
+@pytest.mark.asyncio
+async def test_speculative_answer_used_when_search_is_empty(monkeypatch):
+    monkeypatch.setenv("KNOWLEDGE_AGENT_SPECULATIVE", "1")
+    agent = _make_agent(None, _EmptyDB())
+    agent.knowledge_llm = _ScriptedLLM()
+
+    result = await agent.execute([{"role": "user", "content": "What is X?"}], {}, {})
+
+    assert result["response"] == "speculative"
+    assert result["knowledge_data"]["metadata"]["speculative"] is True
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("hits", [1, 2])
+async def test_speculative_answer_discarded_when_sources_found(monkeypatch, hits):
+    monkeypatch.setenv("KNOWLEDGE_AGENT_SPECULATIVE", "1")
+
+    class _DocDB:
+        async def semantic_search(self, **kwargs):
+            return [{"id": str(i), "title": "T", "content": f"c{i}", "source": "kb", "score": 0.9} for i in range(hits)]
+
+    agent = _make_agent(None, _DocDB())
+    agent.knowledge_llm = _ScriptedLLM()
+
+    result = await agent.execute([{"role": "user", "content": "What is X?"}], {}, {})
+
+    assert result["response"] == "rag"
+    assert "speculative" not in result["knowledge_data"]["metadata"]
+    assert len(result["knowledge_data"]["sources"]) == hits
+
+
+class _WordEncoder:
+    """Stand-in tokenizer: one token per whitespace-separated word."""
+
+    def encode_batch(self, texts, disallowed_special=()):
+        return [t.split() for t in texts]
+
+    def decode(self, ids):
+        return " ".join(ids)
+
+
+def test_source_excerpts_share_token_budget(monkeypatch):
+    monkeypatch.setattr(knowledge_mod, "_token_encoder", lambda model: _WordEncoder())
+    agent = _make_agent(None, None)
+    docs = agent._convert_raw_results([
+        {"id": str(i), "title": "T", "content": "word " * 5000, "source": f"s{i}"} for i in range(4)
+    ])
+
+    excerpts = agent._truncate_excerpts(docs)
+
+    per_source = knowledge_mod.SOURCE_TOKEN_BUDGET // 4
+    assert all(len(e.split()) == per_source for e in excerpts)
+    assert len(agent._truncate_excerpts(docs[:1])[0].split()) == 5000
+
+
+class _SlowLLM:
+    async def ainvoke(self, messages):
+        await asyncio.sleep(5)
+        return type("Resp", (), {"content": "slow"})()
+
+
+class _FastFallback:
+    async def generate_response(self, user_input, context=None):
+        return {"response": "fallback answer", "metadata": {}}
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_with_fallback(monkeypatch):
+    monkeypatch.setattr(knowledge_mod, "RAG_HEDGE_DELAY", 0.01)
+    agent = _make_agent(None, _FakeDB())
+    agent.knowledge_llm = _SlowLLM()
+    agent.fallback_provider = _FastFallback()
+
+    result = await agent.execute([{"role": "user", "content": "What is X?"}], {}, {})
+
+    assert result["response"] == "fallback answer"
+
+
+@pytest.mark.asyncio
+async def test_rag_timeout_returns_source_summary(monkeypatch):
+    monkeypatch.setattr(knowledge_mod, "RAG_HEDGE_DELAY", 0.01)
+    agent = _make_agent(None, _FakeDB())
+    agent.knowledge_llm = _SlowLLM()
+    agent.rag_timeout = 0.05
+
+    result = await agent.execute([{"role": "user", "content": "What is X?"}], {}, {})
+
+    assert result["response"].startswith("Query: What is X?")
+
+
+@pytest.mark.asyncio
+async def test_sources_validated_into_knowledge_documents_at_response():
+    class _MixedDB:
+        async def semantic_search(self, **kwargs):
+            return [
+                {"id": "ok", "title": "T", "content": "c", "source": "kb", "score": 0.7},
+                {"id": "bad", "title": "T", "content": "c", "source": "kb", "score": 3.5},
+            ]
+
+    agent = _make_agent(None, _MixedDB())
+    result = await agent._perform_knowledge_search(knowledge_mod.KnowledgeQuery(query="q"))
+
+    assert [type(s) for s in result.sources] == [knowledge_mod.KnowledgeDocument]
+    assert result.sources[0].id == "ok"
+
+
+@pytest.mark.asyncio
+async def test_malformed_rows_are_dropped_not_fatal():
+    class _BadRowDB:
+        async def semantic_search(self, **kwargs):
+            return [
+                {"id": "ok", "title": "T", "content": "c", "source": "kb", "score": 0.7},
+                {"id": "bad", "title": 123, "content": "c", "source": "kb", "score": 0.5},
+            ]
+
+    agent = _make_agent(None, _BadRowDB())
+    result = await agent._perform_knowledge_search(knowledge_mod.KnowledgeQuery(query="q"))
+    assert [s.id for s in result.sources] == ["ok"]
+
+    hits = agent._convert_raw_results([{"id": "a", "title": "T", "content": "c", "source": "kb"}])
+    hits.append(knowledge_mod._RetrievedDocument(id="b", title=None, content="c", source="kb"))
+    assert [d.id for d in agent._validate_sources(hits)] == ["a"]
@@ -0,0 +1,47 @@
+import importlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+backend_mod = importlib.import_module("cartrita.orchestrator.agents.knowledge.faiss_backend")
+
+
+class _VectorEmbedder:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def aembed_query(self, text):
+        return self.vectors[text]
+
+    async def aembed_documents(self, texts):
+        return [self.vectors[t] for t in texts]
+
+
+@pytest.mark.asyncio
+async def test_faiss_backend_semantic_search_returns_nearest_documents():
+    rng = np.random.default_rng(0)
+    corpus = rng.normal(size=(256, 8)).astype(np.float32)
+    backend = backend_mod.FaissBackend(_VectorEmbedder({}), dim=8, nlist=4, m=2, nbits=4, nprobe=4)
+    backend.train(corpus)
+
+    documents = [
+        {"id": f"d{i}", "title": f"Doc {i}", "content": f"text {i}", "metadata": {"lang": "en" if i % 2 else "es"}}
+        for i in range(len(corpus))
+    ]
+    backend.add_documents(documents, corpus)
+    backend.embedder.vectors["q"] = corpus[7]
+
+    results = await backend.semantic_search("q", top_k=3)
+    assert results[0]["id"] == "d7"
+    assert all(0.0 <= r["score"] <= 1.0 for r in results)
+
+    filtered = await backend.semantic_search("q", top_k=3, filters={"lang": "es"})
+    assert filtered and all(r["metadata"]["lang"] == "es" for r in filtered)
+
+
+def test_faiss_backend_requires_training_before_add():
+    backend = backend_mod.FaissBackend(_VectorEmbedder({}), dim=8, nlist=4, m=2, nbits=4)
+    with pytest.raises(RuntimeError):
+        backend.add_documents([{"id": "d0"}], np.zeros((1, 8), dtype=np.float32))
@@ -0,0 +1,289 @@
+import asyncio
+import importlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import pytest
+
+os.environ.setdefault("CARTRITA_DISABLE_DB", "1")
+
+pytest.importorskip("langchain")
+
+base_mod = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.base_tool")
+math_mod = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.tools_math")
+
+
+def test_rate_limit_admits_up_to_limit_per_window(monkeypatch):
+    tool = math_mod.MathCalculatorTool(rate_limit=2)
+    clock = [1000.0]
+    monkeypatch.setattr(base_mod.time, "perf_counter", lambda: clock[0])
+
+    assert tool.invoke({"expression": "1+1"}) == "Result: 2"
+    assert tool.invoke({"expression": "1+1"}) == "Result: 2"
+    assert tool.invoke({"expression": "1+1"}).startswith("Rate limit exceeded")
+
+    clock[0] += base_mod.RATE_LIMIT_WINDOW + 1
+    assert tool.invoke({"expression": "1+1"}) == "Result: 2"
+    assert tool.invoke({"expression": "1+1"}) == "Result: 2"
+    assert tool.invoke({"expression": "1+1"}).startswith("Rate limit exceeded")
+    assert len(tool._call_history) == 2
+
+
+def test_rate_limit_follows_changed_limit():
+    tool = math_mod.MathCalculatorTool(rate_limit=2)
+    tool.invoke({"expression": "1+1"})
+    tool.rate_limit = 1
+
+    assert tool.invoke({"expression": "1+1"}).startswith("Rate limit exceeded")
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [("2 + 3 * 4", "Result: 14"), ("sqrt(16) + max(1, 2)", "Result: 6.0"), ("-2 ** 2", "Result: -4")],
+)
+def test_math_calculator_evaluates_whitelisted_expressions(expression, expected):
+    assert math_mod.MathCalculatorTool().invoke({"expression": expression}) == expected
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["__import__('os')", "(1).__class__", "unknown_name + 1", "'a' * 3", "round(2.5, ndigits=0)"],
+)
+def test_math_calculator_rejects_non_arithmetic(expression):
+    result = math_mod.MathCalculatorTool().invoke({"expression": expression})
+    assert result.startswith("Tool execution failed: Invalid mathematical expression")
+
+
+def test_math_expressions_compiled_once():
+    math_mod._compile_expression.cache_clear()
+    tool = math_mod.MathCalculatorTool()
+
+    tool.invoke({"expression": "7 * 6"})
+    tool.invoke({"expression": "7 * 6"})
+
+    info = math_mod._compile_expression.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_web_search_cache_is_bounded_ttl_cache():
+    websearch_mod = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.tools_websearch")
+    tool = websearch_mod.WebSearchTool()
+
+    first = tool.invoke({"query": "cartrita"})
+    assert tool.invoke({"query": "cartrita"}) == first
+    assert len(tool._search_cache) == 1
+
+    assert tool._search_cache.maxsize == websearch_mod.SEARCH_CACHE_MAXSIZE
+    assert tool._search_cache.ttl == websearch_mod.SEARCH_CACHE_TTL
+
+
+@pytest.mark.asyncio
+async def test_file_system_tool_async_path_runs_off_loop(monkeypatch):
+    fs_mod = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.tools_filesystem")
+    threads = []
+    original = fs_mod.FileSystemTool.do_execute
+
+    def recording_execute(self, *args, **kwargs):
+        threads.append(threading.get_ident())
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(fs_mod.FileSystemTool, "do_execute", recording_execute)
+    tool = fs_mod.FileSystemTool()
+
+    assert (await tool.ainvoke({"operation": "write", "path": "async_note.txt", "content": "hi"})).startswith("Successfully")
+    assert await tool.ainvoke({"operation": "read", "path": "async_note.txt"}) == "hi"
+    assert threads and threading.get_ident() not in threads
+
+    monkeypatch.setattr(fs_mod, "READ_MAX_BYTES", 1)
+    assert "too large" in await tool.ainvoke({"operation": "read", "path": "async_note.txt"})
+
+
+def test_metrics_derived_on_export():
+    tool = math_mod.MathCalculatorTool()
+    assert tool.get_metrics().last_used is None
+
+    tool.invoke({"expression": "1+1"})
+    tool.invoke({"expression": "not math"})
+    metrics = tool.get_metrics()
+
+    assert (metrics.total_calls, metrics.error_count) == (2, 1)
+    assert metrics.success_rate == 0.5
+    assert metrics.average_execution_time >= 0.0
+    assert abs((datetime.now() - metrics.last_used).total_seconds()) < 5
+
+    assert metrics.dict()["total_calls"] == 2
+    with pytest.raises(AttributeError):
+        metrics.total_calls = 0
+
+    tool.reset_metrics()
+    assert tool.get_metrics().total_calls == 0
+
+
+def test_math_function_table_is_read_only():
+    with pytest.raises(TypeError):
+        math_mod._FUNCTIONS["open"] = open
+
+
+def test_metrics_table_grows_and_summarizes_vectorized():
+    table = base_mod.ToolMetricsTable(capacity=2)
+    rows = [table.allocate() for _ in range(3)]
+    assert sorted(rows) == [0, 1, 2]
+
+    table.record(rows[0], True, 0.2, 10.0)
+    table.record(rows[0], False, 0.4, 11.0)
+    summary = table.summarize(rows)
+
+    assert summary["total_calls"].tolist() == [2, 0, 0]
+    assert summary["success_rate"].tolist() == [0.5, 1.0, 1.0]
+    assert summary["average_execution_time"][0] == pytest.approx(0.3)
+    assert base_mod.ToolMetricsTable.to_metrics("t", summary, 1).last_used is None
+
+    table.release(rows[0])
+    assert table.allocate() == rows[0]
+    assert table.calls[rows[0]] == 0
+
+
+@pytest.mark.asyncio
+async def test_async_call_times_out_and_records_failure(monkeypatch):
+    async def slow(self, *args, **kwargs):
+        await asyncio.sleep(1)
+        return "late"
+
+    websearch_mod = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.tools_websearch")
+    monkeypatch.setattr(websearch_mod.WebSearchTool, "do_aexecute", slow)
+    tool = websearch_mod.WebSearchTool(timeout_s=0.01)
+
+    result = await tool.ainvoke({"query": "slow"})
+
+    assert result.startswith("Tool execution timed out: web_search")
+    metrics = tool.get_metrics()
+    assert (metrics.total_calls, metrics.error_count) == (1, 1)
+
+
+@pytest.fixture
+def code_mod():
+    module = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.tools_code")
+    yield module
+    module.shutdown_code_pool()
+
+
+@pytest.mark.asyncio
+async def test_code_executor_evaluates_in_sandbox_pool(code_mod):
+    tool = code_mod.CodeExecutorTool(rate_limit=100)
+
+    assert tool.invoke({"code": "sum(range(5))"}) == "10"
+    results = await asyncio.gather(*(tool.ainvoke({"code": f"{i} * 2"}) for i in range(4)))
+    assert results == ["0", "2", "4", "6"]
+    assert (await tool.ainvoke({"code": "__import__('os')"})).startswith("Execution error")
+    pool = code_mod._get_pool()
+    assert os.getpid() not in set(pool._processes)
+    assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+    compiled = code_mod.compile_safe_expression("sqrt(16) + len([1, 2])", code_mod._ALLOWED_NAMES)
+    assert eval(compiled, code_mod._SANDBOX_GLOBALS, {}) == 6.0
+    assert code_mod._SANDBOX_GLOBALS["__builtins__"] == {}
+
+
+def test_safe_eval_whitelists_nodes_and_names_before_compiling():
+    safe_eval = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.safe_eval")
+
+    assert safe_eval.safe_eval_expression("max(2, 3) ** 2 > 8 and 1 < 2", {"max": max}) is True
+    with pytest.raises(ValueError, match="Attribute"):
+        safe_eval.safe_eval_expression("().__class__", {})
+    with pytest.raises(ValueError, match="'open' is not allowed"):
+        safe_eval.safe_eval_expression("open('x')", {"max": max})
+
+
+def test_metrics_table_keeps_updates_made_while_growing():
+    table = base_mod.ToolMetricsTable(capacity=1)
+    row = table.allocate()
+
+    def record_many():
+        for _ in range(2000):
+            table.record(row, True, 0.001, 1.0)
+
+    workers = [threading.Thread(target=record_many) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for _ in range(200):
+        table.allocate()
+    for worker in workers:
+        worker.join()
+
+    assert table.calls[row] == 8000
+
+
+def test_structured_results_rendered_as_json(monkeypatch):
+    monkeypatch.setattr(math_mod.MathCalculatorTool, "do_execute", lambda self, *a, **k: {"value": 3, 1: [1.5]})
+    tool = math_mod.MathCalculatorTool()
+
+    assert json.loads(tool.invoke({"expression": "1+2"})) == {"value": 3, "1": [1.5]}
+    assert base_mod._to_text(object).startswith("<class")
+
+
+def test_call_history_kept_only_for_rate_limited_tools():
+    unlimited = math_mod.MathCalculatorTool()
+    limited = math_mod.MathCalculatorTool(rate_limit=5)
+
+    for tool in (unlimited, limited):
+        tool.invoke({"expression": "1+1"})
+
+    assert unlimited._call_history is not limited._call_history
+    assert len(unlimited._call_history) == 0
+    assert len(limited._call_history) == 1
+
+
+@pytest.mark.asyncio
+async def test_progress_text_skipped_without_handlers():
+    class RunManager:
+        def __init__(self, handlers):
+            self.handlers = handlers
+            self.texts = []
+
+        async def on_text(self, text, **kwargs):
+            self.texts.append(text)
+
+    tool = math_mod.MathCalculatorTool()
+    silent, listening = RunManager([]), RunManager([object()])
+
+    assert await tool._arun(expression="1+1", run_manager=silent) == "Result: 2"
+    assert await tool._arun(expression="1+1", run_manager=listening) == "Result: 2"
+    assert silent.texts == []
+    assert [text.split()[0] for text in listening.texts] == ["Executing", "Completed"]
+
+
+@pytest.mark.asyncio
+async def test_blocking_tool_runs_off_loop_so_timeout_fires(monkeypatch):
+    release = threading.Event()
+
+    def stuck(self, *args, **kwargs):
+        release.wait(5)
+        return "late"
+
+    monkeypatch.setattr(math_mod.MathCalculatorTool, "do_execute", stuck)
+    tool = math_mod.MathCalculatorTool(blocking=True, timeout_s=0.05)
+
+    try:
+        assert (await tool.ainvoke({"expression": "1+1"})).startswith("Tool execution timed out")
+    finally:
+        release.set()
+
+
+@pytest.mark.asyncio
+async def test_web_search_runs_off_loop_so_timeout_applies(monkeypatch):
+    websearch_mod = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.tools_websearch")
+    release = threading.Event()
+    original = websearch_mod.WebSearchTool.do_execute
+
+    def stuck(self, *args, **kwargs):
+        release.wait(5)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(websearch_mod.WebSearchTool, "do_execute", stuck)
+    tool = websearch_mod.WebSearchTool(timeout_s=0.05)
+
+    try:
+        assert (await tool.ainvoke({"query": "slow"})).startswith("Tool execution timed out")
+    finally:
+        release.set()
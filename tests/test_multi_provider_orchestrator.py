@@ -0,0 +1,380 @@
+import asyncio
+import importlib
+import os
+import time
+
+import pytest
+
+os.environ.setdefault("CARTRITA_DISABLE_DB", "1")
+
+pytest.importorskip("langchain")
+
+from langchain_core.messages import AIMessage  # noqa: E402
+
+mpo = importlib.import_module("cartrita.orchestrator.agents.langchain_enhanced.multi_provider_orchestrator")
+
+
+class FakeChatModel:
+    def __init__(self, reply="answer"):
+        self.reply = reply
+        self.calls = []
+
+    async def ainvoke(self, messages, callbacks=None):
+        self.calls.append(messages)
+        return AIMessage(content=self.reply)
+
+
+def _orchestrator(monkeypatch, models=("fake",), **kwargs):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.delenv("HUGGINGFACE_API_KEY", raising=False)
+    kwargs.setdefault("fallback_strategy", False)
+    orch = mpo.MultiProviderOrchestrator(cost_optimization=False, **kwargs)
+    monkeypatch.setattr(orch, "_estimate_token_count", lambda query, context=None, messages=None: len(query) // 4)
+    monkeypatch.setattr(orch, "_estimate_response_tokens", lambda response: len(response) // 4)
+    for model_id in models:
+        config = mpo.ModelConfig(
+            name=model_id, provider=mpo.ModelProvider.OPENAI, cost_per_1k_tokens=0.01, max_tokens=8192,
+            quality_score=0.9,
+        )
+        orch.add_model(model_id, config, FakeChatModel())
+    return orch
+
+
+@pytest.mark.asyncio
+async def test_identical_prompt_served_from_cache_when_deterministic(monkeypatch):
+    orch = _orchestrator(monkeypatch, temperature=0)
+    model = orch.model_instances["fake"]
+
+    first = await orch.execute_with_optimal_model("What is 2+2?")
+    orch.reset_session()
+    second = await orch.execute_with_optimal_model("What is 2+2?")
+
+    assert len(model.calls) == 1
+    assert second["response"] == first["response"] and second["cached"] is True
+    assert second["cost"] == 0.0
+
+    # Same query with different conversation memory is a different prompt
+    await orch.execute_with_optimal_model("What is 2+2?")
+    assert len(model.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_sampled_responses_not_cached(monkeypatch):
+    orch = _orchestrator(monkeypatch)
+    model = orch.model_instances["fake"]
+
+    for _ in range(2):
+        await orch.execute_with_optimal_model("What is 2+2?")
+        orch.reset_session()
+
+    assert len(model.calls) == 2
+
+
+class FakeEmbedder:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def aembed_query(self, text):
+        return self.vectors[text]
+
+
+@pytest.mark.asyncio
+async def test_paraphrase_served_from_semantic_cache_under_same_history(monkeypatch):
+    embedder = FakeEmbedder({
+        "capital of France?": [1.0, 0.0, 0.0],
+        "France's capital?": [0.99, 0.05, 0.0],
+        "tallest mountain?": [0.0, 1.0, 0.0],
+    })
+    orch = _orchestrator(monkeypatch, query_embedder=embedder, temperature=0)
+    model = orch.model_instances["fake"]
+
+    await orch.execute_with_optimal_model("capital of France?")
+    orch.reset_session()
+    paraphrase = await orch.execute_with_optimal_model("France's capital?")
+    assert paraphrase["cached"] is True and len(model.calls) == 1
+
+    orch.reset_session()
+    await orch.execute_with_optimal_model("tallest mountain?")
+    assert len(model.calls) == 2
+
+    # Different conversation history: a different prompt, so no reuse
+    await orch.execute_with_optimal_model("capital of France?")
+    assert len(model.calls) == 3
+
+    # A paraphrase later in a conversation hits when the history matches
+    for query in ("capital of France?", "France's capital?"):
+        orch.reset_session()
+        orch.memory.save_context({"input": "hello"}, {"output": "hi"})
+        result = await orch.execute_with_optimal_model(query)
+    assert result["cached"] is True and len(model.calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_sampled_responses_not_stored_in_semantic_cache(monkeypatch):
+    embedder = FakeEmbedder({"capital of France?": [1.0, 0.0, 0.0]})
+    orch = _orchestrator(monkeypatch, query_embedder=embedder)
+
+    await orch.execute_with_optimal_model("capital of France?")
+    assert len(orch.semantic_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_prompts_share_one_call(monkeypatch):
+    orch = _orchestrator(monkeypatch, temperature=0)
+    model = orch.model_instances["fake"]
+    release = asyncio.Event()
+    original = model.ainvoke
+
+    async def slow_ainvoke(messages, callbacks=None):
+        await release.wait()
+        return await original(messages, callbacks)
+
+    model.ainvoke = slow_ainvoke
+    first = asyncio.create_task(orch.execute_with_optimal_model("What is 2+2?"))
+    second = asyncio.create_task(orch.execute_with_optimal_model("What is 2+2?"))
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(first, second)
+
+    assert len(model.calls) == 1
+    assert [r["response"] for r in results] == ["answer", "answer"]
+    assert sorted(bool(r.get("cached")) for r in results) == [False, True]
+    assert orch._inflight == {}
+
+
+def test_selection_uses_capability_index(monkeypatch):
+    orch = _orchestrator(monkeypatch, models=())
+    for model_id, function_calling, expertise in (("plain", False, ["coding"]), ("tools", True, ["general"])):
+        config = mpo.ModelConfig(
+            name=model_id, provider=mpo.ModelProvider.OPENAI, cost_per_1k_tokens=0.001, max_tokens=8192,
+            supports_function_calling=function_calling, expertise_areas=expertise, quality_score=0.9,
+        )
+        orch.add_model(model_id, config, FakeChatModel())
+
+    def requirements(**kwargs):
+        return mpo.TaskRequirements(
+            complexity=mpo.TaskComplexity.MEDIUM, max_cost=5.0, max_latency=30.0, quality_threshold=0.8, **kwargs
+        )
+
+    assert orch.select_optimal_model(requirements(requires_function_calling=True)) == "tools"
+    assert orch.select_optimal_model(requirements(domain_expertise=["coding"])) == "plain"
+    assert orch.select_optimal_model(requirements(), context_length=10_000) is None
+
+
+def test_suitability_rewards_recorded_success(monkeypatch):
+    orch = _orchestrator(monkeypatch, models=("steady", "flaky"))
+    for success in (True, True):
+        orch._record_performance("steady", 0.1, 0.0, success)
+    for success in (False, False):
+        orch._record_performance("flaky", 0.1, 0.0, success)
+
+    requirements = mpo.TaskRequirements(
+        complexity=mpo.TaskComplexity.MEDIUM, max_cost=5.0, max_latency=30.0, quality_threshold=0.8
+    )
+    assert orch.select_optimal_model(requirements) == "steady"
+
+
+def test_token_estimate_encodes_memory_messages_once(monkeypatch):
+    encoded = []
+
+    class Encoding:
+        def encode(self, text, disallowed_special=()):
+            encoded.append(text)
+            return text.split()
+
+    monkeypatch.setattr(mpo, "_token_encoder", lambda: Encoding())
+    mpo._token_counts.clear()
+    orch = _orchestrator(monkeypatch, models=())
+    orch.memory.save_context({"input": "earlier question here"}, {"output": "earlier answer"})
+
+    estimate = mpo.MultiProviderOrchestrator._estimate_token_count
+    assert estimate(orch, "new query", "some context") == 2 + 2 + 3 + 2
+    estimate(orch, "another query")
+
+    assert encoded.count("earlier question here") == 1
+    mpo._token_counts.clear()
+
+
+def test_performance_window_is_bounded(monkeypatch):
+    orch = _orchestrator(monkeypatch, models=())
+    for i in range(mpo.PERFORMANCE_WINDOW + 5):
+        orch._record_performance("fake", 1.0, 0.5, i % 2 == 0)
+
+    metrics = orch.get_performance_metrics()["individual_models"]["fake"]
+    assert metrics["total_calls"] == mpo.PERFORMANCE_WINDOW
+    assert metrics["average_execution_time"] == 1.0 and metrics["average_cost"] == 0.5
+    assert metrics["success_rate"] == 0.5
+
+
+def test_running_totals_track_the_window(monkeypatch):
+    orch = _orchestrator(monkeypatch, models=())
+    for i in range(mpo.PERFORMANCE_WINDOW * 2 + 7):
+        orch._record_performance("fake", i * 0.01, i * 0.001, i % 3 != 0)
+
+    records = orch.model_performance["fake"]
+    metrics = orch.get_performance_metrics()["individual_models"]["fake"]
+    assert metrics["average_execution_time"] == pytest.approx(sum(r.execution_time for r in records) / len(records))
+    assert metrics["average_cost"] == pytest.approx(sum(r.cost for r in records) / len(records))
+    assert metrics["success_rate"] == pytest.approx(sum(r.success for r in records) / len(records))
+
+
+def test_sync_chat_reuses_one_event_loop(monkeypatch):
+    orch = _orchestrator(monkeypatch)
+    model = orch.model_instances["fake"]
+    loops = []
+    original = model.ainvoke
+
+    async def recording_ainvoke(messages, callbacks=None):
+        loops.append(asyncio.get_running_loop())
+        return await original(messages, callbacks)
+
+    model.ainvoke = recording_ainvoke
+    assert orch.chat("first") == "answer"
+    assert orch.chat("second") == "answer"
+
+    assert len(loops) == 2 and loops[0] is loops[1]
+    assert not loops[0].is_closed()
+    orch.close()
+
+
+@pytest.mark.asyncio
+async def test_provider_concurrency_and_rate_are_throttled(monkeypatch):
+    monkeypatch.setitem(mpo.PROVIDER_CONCURRENCY, mpo.ModelProvider.OPENAI, 1)
+    monkeypatch.setitem(mpo.PROVIDER_REQUESTS_PER_MINUTE, mpo.ModelProvider.OPENAI, 6000.0)
+    orch = _orchestrator(monkeypatch)
+    model = orch.model_instances["fake"]
+    active, peak = [0], [0]
+    original = model.ainvoke
+
+    async def tracking_ainvoke(messages, callbacks=None):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        active[0] -= 1
+        return await original(messages, callbacks)
+
+    model.ainvoke = tracking_ainvoke
+    await asyncio.gather(*(orch.execute_with_optimal_model(f"question {i}") for i in range(3)))
+    assert peak[0] == 1
+
+    # An empty bucket refills at 100 requests/s, so the next call waits ~10ms
+    orch._buckets[mpo.ModelProvider.OPENAI] = (0.0, time.monotonic())
+    started = time.monotonic()
+    await orch.execute_with_optimal_model("after the burst")
+    assert time.monotonic() - started >= 0.009
+
+
+def test_memory_is_a_token_budgeted_window(monkeypatch):
+    class Encoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+
+    monkeypatch.setattr(mpo, "_token_encoder", lambda: Encoding())
+    mpo._token_counts.clear()
+    orch = _orchestrator(monkeypatch, models=(), memory_token_limit=6)
+    assert isinstance(orch.memory, mpo.TokenBudgetMemory)
+
+    orch.memory.save_context({"input": "one two"}, {"output": "three four"})
+    orch.memory.save_context({"input": "five six"}, {"output": "seven eight"})
+
+    assert [m.content for m in orch.memory.chat_memory.messages] == ["three four", "five six", "seven eight"]
+    mpo._token_counts.clear()
+
+
+@pytest.mark.asyncio
+async def test_memory_loaded_once_per_request(monkeypatch):
+    orch = _orchestrator(monkeypatch)
+    monkeypatch.delattr(orch, "_estimate_token_count")
+    orch.memory.save_context({"input": "earlier"}, {"output": "reply"})
+    loads = []
+    original = type(orch.memory).load_memory_variables
+
+    def counting_load(self, inputs):
+        loads.append(inputs)
+        return original(self, inputs)
+
+    monkeypatch.setattr(type(orch.memory), "load_memory_variables", counting_load)
+    result = await orch.execute_with_optimal_model("next question")
+
+    assert result["success"] and len(loads) == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_with_fallback_for_latency_sensitive_tasks(monkeypatch):
+    monkeypatch.setattr(mpo, "HEDGE_DELAY", 0.01)
+    orch = _orchestrator(monkeypatch, models=("primary", "backup"), fallback_strategy=True)
+    monkeypatch.setattr(orch, "select_optimal_model", lambda *args, **kwargs: "primary")
+    monkeypatch.setattr(orch, "_get_fallback_model", lambda: "backup")
+    primary, backup = orch.model_instances["primary"], orch.model_instances["backup"]
+    primary_delay, cancelled = [1.0], []
+    original = primary.ainvoke
+
+    async def slow_ainvoke(messages, callbacks=None):
+        try:
+            await asyncio.sleep(primary_delay[0])
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return await original(messages, callbacks)
+
+    primary.ainvoke = slow_ainvoke
+
+    def requirements(max_latency):
+        return mpo.TaskRequirements(
+            complexity=mpo.TaskComplexity.MEDIUM, max_cost=5.0, max_latency=max_latency, quality_threshold=0.8
+        )
+
+    started = time.monotonic()
+    result = await orch.execute_with_optimal_model("urgent", task_requirements=requirements(2.0))
+    assert time.monotonic() - started < 0.5
+    assert result["selected_model"] == "backup" and result["hedged"] is True
+    await asyncio.sleep(0)
+    assert cancelled == [True] and len(backup.calls) == 1
+
+    # Latency-tolerant tasks wait for the primary rather than paying for a second call
+    primary_delay[0] = 0.05
+    result = await orch.execute_with_optimal_model("relaxed", task_requirements=requirements(30.0))
+    assert result["selected_model"] == "primary" and "hedged" not in result
+    assert len(backup.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_sync_and_async_entry_points_use_per_loop_connection_pools(monkeypatch):
+    llm_factory = importlib.import_module("cartrita.orchestrator.utils.llm_factory")
+    used = []
+
+    class PooledModel(FakeChatModel):
+        def __init__(self, http_async_client=None, **kwargs):
+            super().__init__()
+            self.client = http_async_client
+
+        async def ainvoke(self, messages, callbacks=None):
+            used.append((asyncio.get_running_loop(), self.client))
+            return await super().ainvoke(messages, callbacks)
+
+    monkeypatch.setattr(llm_factory, "create_chat_openai", PooledModel)
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.delenv("HUGGINGFACE_API_KEY", raising=False)
+    orch = mpo.MultiProviderOrchestrator(cost_optimization=False, fallback_strategy=False)
+
+    assert orch.chat("first") == "answer"
+    assert await orch.achat("second") == "answer"
+    assert await orch.achat("third") == "answer"
+
+    (sync_loop, sync_client), (loop, client), (_, again) = used
+    assert sync_loop is not loop and loop is asyncio.get_running_loop()
+    assert isinstance(client, mpo.httpx.AsyncClient) and sync_client is not client and again is client
+
+    await orch.aclose()
+    orch.close()
+    assert client.is_closed and sync_client.is_closed
+
+
+def test_token_counts_memoized_by_digest():
+    mpo._token_counts.clear()
+    prompt = "word " * 1000
+
+    assert mpo._count_tokens(prompt) == mpo._count_tokens(prompt)
+    assert len(mpo._token_counts) == 1
+    assert all(isinstance(key, bytes) and len(key) == 16 for key in mpo._token_counts)
+    mpo._token_counts.clear()
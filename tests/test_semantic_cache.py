@@ -0,0 +1,43 @@
+import importlib
+
+import numpy as np
+import pytest
+
+semantic_cache_mod = importlib.import_module("cartrita.orchestrator.utils.semantic_cache")
+
+
+@pytest.fixture(params=[False, True], ids=["numpy", "faiss"])
+def cache_cls(request, monkeypatch):
+    if request.param and not semantic_cache_mod.FAISS_AVAILABLE:
+        pytest.skip("faiss not installed")
+    monkeypatch.setattr(semantic_cache_mod, "FAISS_AVAILABLE", request.param)
+    return semantic_cache_mod.SemanticQueryCache
+
+
+def _vec(*values):
+    return semantic_cache_mod.SemanticQueryCache.normalize(values)
+
+
+def test_lookup_skips_closer_entry_with_other_signature(cache_cls):
+    cache = cache_cls(threshold=0.9)
+    cache.add(_vec(1.0, 0.0), ("model-a",), "a")
+    cache.add(_vec(0.97, 0.05), ("model-b",), "b")
+
+    assert cache.lookup(_vec(1.0, 0.0), ("model-b",)) == "b"
+    assert cache.lookup(_vec(1.0, 0.0), ("model-c",)) is None
+    assert cache.lookup(_vec(0.0, 1.0), ("model-a",)) is None
+
+
+def test_matrix_grows_without_copy_per_add(monkeypatch):
+    monkeypatch.setattr(semantic_cache_mod, "FAISS_AVAILABLE", False)
+    cache = semantic_cache_mod.SemanticQueryCache(threshold=0.99, max_entries=1000)
+    rng = np.random.default_rng(0)
+    vectors = [cache.normalize(v) for v in rng.normal(size=(300, 4))]
+    reallocations = 0
+    for i, vector in enumerate(vectors):
+        before = cache._matrix
+        cache.add(vector, (), i)
+        reallocations += cache._matrix is not before
+
+    assert reallocations <= 4 and len(cache._matrix) <= 1000
+    assert [cache.lookup(v, ()) for v in vectors[::50]] == list(range(0, 300, 50))